@@ -0,0 +1,278 @@
+"""
+Кэш в файле SQLite, общий для всех процессов на одной машине.
+Вытеснение — по давности обращения (LRU) при превышении
+MAX_ENTRIES записей или MAX_SIZE байт. add и incr атомарны
+между процессами, get_many и set_many выполняются одним запросом.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL,'
+    ' size INTEGER NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+
+# SQLite ограничивает количество параметров в одном запросе
+MAX_QUERY_PARAMS = 900
+
+
+def chunked(items, size=MAX_QUERY_PARAMS):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """
+    Параметры OPTIONS:
+    MAX_ENTRIES и CULL_FREQUENCY — как у встроенных бэкендов;
+    MAX_SIZE — предельный суммарный размер значений в байтах;
+    CULL_EVERY — раз в сколько записей процесс проверяет размер кэша;
+    ACCESS_RESOLUTION — с какой точностью в секундах хранится
+    время последнего обращения (реже пишем в файл при чтении);
+    BUSY_TIMEOUT — сколько секунд ждать чужую запись.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._max_size = options.get('MAX_SIZE')
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._access_resolution = float(options.get('ACCESS_RESOLUTION', 1))
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._location,
+                timeout=self._busy_timeout,
+                isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            local.connection = connection
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.connection
+
+    def _serialize(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _deserialize(self, value):
+        return pickle.loads(value)
+
+    def _prepare_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        value = self._serialize(value)
+        return key, value, self.get_backend_timeout(timeout), now, len(value)
+
+    def _written(self, count=1):
+        """Считает записи и время от времени вытесняет лишнее."""
+        self._local.writes += count
+        if self._local.writes >= self._cull_every:
+            self._local.writes = 0
+            self._cull()
+
+    def _cull(self):
+        connection = self._connection
+        now = time.time()
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,)
+        )
+        entries, size = connection.execute(
+            'SELECT COUNT(*), TOTAL(size) FROM cache'
+        ).fetchone()
+        too_many = entries > self._max_entries
+        too_big = self._max_size is not None and size > self._max_size
+        if not (too_many or too_big):
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        # Как и встроенные бэкенды, удаляем 1/CULL_FREQUENCY записей,
+        # но самые давно прочитанные
+        excess = max(entries - self._max_entries, 0)
+        count = max(excess, entries // self._cull_frequency, 1)
+        connection.execute(
+            'DELETE FROM cache WHERE key IN '
+            '(SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+            (count,)
+        )
+
+    def _touch_accessed(self, keys, accessed, now):
+        """Обновляет время обращения, если оно заметно устарело."""
+        stale = [
+            key for key in keys
+            if now - accessed[key] >= self._access_resolution
+        ]
+        for chunk in chunked(stale):
+            self._connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)),
+                (now, *chunk)
+            )
+
+    def _fetch(self, keys):
+        """Непросроченные значения по готовым ключам."""
+        now = time.time()
+        found = {}
+        accessed = {}
+        for chunk in chunked(keys):
+            rows = self._connection.execute(
+                'SELECT key, value, accessed FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                (*chunk, now)
+            )
+            for key, value, last_access in rows:
+                found[key] = self._deserialize(value)
+                accessed[key] = last_access
+        self._touch_accessed(found, accessed, now)
+        return found
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        now = time.time()
+        cursor = self._connection.execute(
+            'INSERT INTO cache (key, value, expires, accessed, size) '
+            'VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (*self._row(key, value, timeout, now), now)
+        )
+        added = cursor.rowcount > 0
+        if added:
+            self._written()
+        return added
+
+    def get(self, key, default=None, version=None):
+        key = self._prepare_key(key, version)
+        return self._fetch([key]).get(key, default)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache '
+            '(key, value, expires, accessed, size) '
+            'VALUES (?, ?, ?, ?, ?)',
+            self._row(key, value, timeout, time.time())
+        )
+        self._written()
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._prepare_key(key, version)
+        now = time.time()
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self._prepare_key(key, version)
+        cursor = self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self._prepare_key(key, version)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def get_many(self, keys, version=None):
+        prepared = {self._prepare_key(key, version): key for key in keys}
+        found = self._fetch(list(prepared))
+        return {prepared[key]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._prepare_key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache '
+                '(key, value, expires, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?)',
+                rows
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        self._written(len(rows))
+        return []
+
+    def delete_many(self, keys, version=None):
+        keys = [self._prepare_key(key, version) for key in keys]
+        for chunk in chunked(keys):
+            self._connection.execute(
+                'DELETE FROM cache WHERE key IN (%s)'
+                % ', '.join('?' * len(chunk)),
+                chunk
+            )
+
+    def incr(self, key, delta=1, version=None):
+        key = self._prepare_key(key, version)
+        connection = self._connection
+        # BEGIN IMMEDIATE сразу берет блокировку записи:
+        # чтение и запись нового значения не перемешаются с чужими
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._deserialize(row[0]) + delta
+            serialized = self._serialize(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (serialized, len(serialized), key)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
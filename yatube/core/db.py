@@ -0,0 +1,88 @@
+"""
+Транзакции записи и их повтор, если база SQLite временно занята
+другим процессом. Настройки соединений — в core.db_backends.sqlite3.
+"""
+import functools
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+
+logger = logging.getLogger(__name__)
+
+# Ошибки SQLite, после которых запись стоит повторить
+LOCK_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_lock_error(error):
+    return any(message in str(error) for message in LOCK_ERRORS)
+
+
+@contextmanager
+def atomic_write(using=None):
+    """
+    transaction.atomic для транзакций, которые будут писать:
+    внешняя транзакция начинается с BEGIN IMMEDIATE и берет блокировку
+    записи сразу. Обычный atomic начинает транзакцию с BEGIN и не мешает
+    читателям. Вложенный в открытую транзакцию atomic_write — просто
+    точка сохранения.
+    """
+    connection = transaction.get_connection(using)
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN уже выполнен, вложенные atomic его не меняют
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+def retry_on_lock(func):
+    """
+    Выполняет func в atomic_write и при временной блокировке базы
+    повторяет ее с экспоненциальной задержкой и разбросом:
+    DB_LOCK_RETRIES попыток, начиная с DB_LOCK_RETRY_DELAY секунд.
+    Откат транзакции гарантирует, что повтор не задвоит записи,
+    поэтому в func — только запись в базу: файлы и чтение для
+    страницы остаются снаружи и не повторяются.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = settings.DB_LOCK_RETRY_DELAY
+        for attempt in range(1, settings.DB_LOCK_RETRIES + 1):
+            try:
+                with atomic_write():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (
+                    not is_lock_error(error)
+                    or attempt == settings.DB_LOCK_RETRIES
+                ):
+                    raise
+                logger.warning(
+                    'База занята, попытка %s: %s', attempt, func.__qualname__
+                )
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+    return wrapper
+
+
+def retry_save(instance):
+    """
+    instance.save() через retry_on_lock. Откат неудачной попытки
+    отменяет и вставку, поэтому перед повтором объект возвращается
+    в прежнее состояние: новый снова без pk и с _state.adding.
+    """
+    adding, pk = instance._state.adding, instance.pk
+
+    @retry_on_lock
+    def save():
+        instance._state.adding, instance.pk = adding, pk
+        instance.save()
+
+    save()
@@ -0,0 +1,49 @@
+"""
+SQLite для нескольких процессов-воркеров.
+Каждое соединение получает настройки SQLITE_PRAGMAS и PRAGMAS
+из настроек своей базы. Транзакции core.db.atomic_write начинаются
+с BEGIN IMMEDIATE: блокировка записи берется сразу и при занятой базе
+ждет busy_timeout. Обычный BEGIN в режиме WAL падает с 'database is
+locked' без ожидания, если транзакция сначала читала, а потом пытается
+писать после чужой записи; читающим транзакциям хватает BEGIN.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Выставляет core.db.atomic_write перед началом транзакции
+    begin_immediate = False
+
+    def pragmas(self):
+        return {
+            **settings.SQLITE_PRAGMAS,
+            **self.settings_dict.get('PRAGMAS', {}),
+        }
+
+    def checks_foreign_keys(self):
+        """
+        Шарды постов ссылаются на пользователей и группы из основной
+        базы, поэтому PRAGMAS выключает в них внешние ключи насовсем.
+        """
+        return self.pragmas().get('foreign_keys', 'ON') != 'OFF'
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas().items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        else:
+            super()._start_transaction_under_autocommit()
+
+    def enable_constraint_checking(self):
+        if self.checks_foreign_keys():
+            super().enable_constraint_checking()
+
+    def check_constraints(self, table_names=None):
+        if self.checks_foreign_keys():
+            super().check_constraints(table_names)
@@ -0,0 +1,72 @@
+"""
+Отложенные фрагменты страниц в духе ESI.
+Общая для всех пользователей часть страницы рендерится и кэшируется
+один раз, а на месте персональных фрагментов (шапка, кнопка подписки,
+форма комментария) в ней остаются метки <!--deferred:имя?параметры-->.
+Тег {% deferred %} отмечает запрос (defer), и только в ответах
+на отмеченные запросы DeferredFragmentMiddleware перед отдачей
+заменяет метки фрагментами, собранными для текущего запроса.
+Текст пользователей экранируется шаблонами, поэтому подделать метку
+в кэшированной странице нельзя.
+"""
+import logging
+import re
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+
+logger = logging.getLogger(__name__)
+
+FRAGMENTS = {}
+
+MARKER_RE = re.compile(rb'<!--deferred:(\w+)(?:\?([^>]*))?-->')
+
+
+def fragment(name):
+    """Регистрирует фрагмент: функцию (request, **params) -> str."""
+    def decorator(render):
+        FRAGMENTS[name] = render
+        return render
+    return decorator
+
+
+def marker(name, **params):
+    """Метка фрагмента name с параметрами-строками."""
+    if name not in FRAGMENTS:
+        raise LookupError(f'Неизвестный фрагмент {name!r}')
+    query = f'?{urlencode(params)}' if params else ''
+    return mark_safe(f'<!--deferred:{name}{query}-->')
+
+
+def defer(request):
+    """Отмечает, что в ответе на request есть метки фрагментов."""
+    request.has_deferred_fragments = True
+
+
+def is_deferred(request):
+    return getattr(request, 'has_deferred_fragments', False)
+
+
+def stitch(request, content, charset='utf-8'):
+    """
+    Подставляет в content фрагменты для request. Метка неизвестного
+    фрагмента (например, из кэша до удаления фрагмента) заменяется
+    пустой строкой.
+    """
+    def render(match):
+        name, query = match.groups()
+        name = name.decode()
+        if name not in FRAGMENTS:
+            logger.error('Неизвестный фрагмент %r в %s', name, request.path)
+            return b''
+        params = dict(parse_qsl((query or b'').decode()))
+        return FRAGMENTS[name](request, **params).encode(charset)
+
+    return MARKER_RE.sub(render, content)
+
+
+@fragment('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
@@ -0,0 +1,200 @@
+"""
+Счетчики и гистограммы для Prometheus, общие для всех процессов.
+Каждый процесс копит приращения в памяти и раз в
+METRICS_FLUSH_INTERVAL секунд одной транзакцией прибавляет их
+к значениям в файле SQLite METRICS_LOCATION. /metrics читает
+сумму по всем процессам из этого файла.
+"""
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf
+)
+
+# Имя метрики: (тип, описание)
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса по view.'
+    ),
+    'yatube_db_queries_total': (
+        'counter', 'Запросы к БД по view.'
+    ),
+    'yatube_page_cache_responses_total': (
+        'counter', 'Ответы кэша страниц по view: hit, miss, stale.'
+    ),
+    'yatube_thumbnails_generated_total': (
+        'counter', 'Созданные варианты картинок постов.'
+    ),
+}
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    ' name TEXT NOT NULL,'
+    ' labels TEXT NOT NULL,'
+    ' value REAL NOT NULL,'
+    ' PRIMARY KEY (name, labels)'
+    ') WITHOUT ROWID'
+)
+
+_lock = threading.Lock()
+_pending = defaultdict(float)
+_flushed = time.monotonic()
+_local = threading.local()
+
+
+def _reset_after_fork():
+    """Дочерний процесс не должен повторно записать буфер родителя."""
+    global _lock
+    _lock = threading.Lock()
+    _pending.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _connection():
+    local = _local
+    location = settings.METRICS_LOCATION
+    if getattr(local, 'key', None) != (os.getpid(), location):
+        directory = os.path.dirname(location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            location, timeout=5, isolation_level=None
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(SCHEMA)
+        local.connection = connection
+        local.key = (os.getpid(), location)
+    return local.connection
+
+
+def format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if value % 1 else str(int(value))
+
+
+def inc(name, value=1, **labels):
+    """Прибавляет value к счетчику name с метками labels."""
+    key = (name, json.dumps(sorted(labels.items()), ensure_ascii=False))
+    with _lock:
+        _pending[key] += value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    """Добавляет значение в гистограмму name."""
+    bucket = next(bound for bound in buckets if value <= bound)
+    inc(f'{name}_bucket', le=format_value(bucket), **labels)
+    inc(f'{name}_sum', value, **labels)
+    inc(f'{name}_count', **labels)
+
+
+def flush(force=True):
+    """
+    Записывает накопленные приращения в общий файл.
+    С force=False — не чаще раза в METRICS_FLUSH_INTERVAL секунд.
+    """
+    global _flushed
+    with _lock:
+        now = time.monotonic()
+        if not force and now - _flushed < settings.METRICS_FLUSH_INTERVAL:
+            return
+        _flushed = now
+        rows = [(*key, value) for key, value in _pending.items()]
+        _pending.clear()
+    if not rows:
+        return
+    connection = _connection()
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        connection.executemany(
+            'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+            'ON CONFLICT (name, labels) '
+            'DO UPDATE SET value = value + excluded.value',
+            rows
+        )
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+def observe_request(request, response, timings, total):
+    """Метрики запроса из замеров TimingMiddleware."""
+    match = request.resolver_match
+    # Не найденные адреса не размножают метки
+    view = match.view_name if match else 'unresolved'
+    observe('yatube_request_duration_seconds', total, view=view)
+    inc('yatube_db_queries_total', timings.counts['db'], view=view)
+    cache_result = response.get('X-Cache')
+    if cache_result:
+        inc(
+            'yatube_page_cache_responses_total',
+            view=view,
+            result=cache_result.lower()
+        )
+    flush(force=False)
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', r'\\').replace('"', r'\"')
+        .replace('\n', r'\n')
+    )
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        f'{name}="{escape_label(value)}"' for name, value in labels
+    )
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    values = defaultdict(dict)
+    for name, labels, value in _connection().execute(
+        'SELECT name, labels, value FROM metrics'
+    ):
+        values[name][tuple(map(tuple, json.loads(labels)))] = value
+    lines = []
+    for name, (kind, description) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind != 'histogram':
+            for labels, value in sorted(values[name].items()):
+                lines.append(
+                    f'{name}{format_labels(labels)} {format_value(value)}'
+                )
+            continue
+        buckets = defaultdict(dict)
+        for labels, value in values[f'{name}_bucket'].items():
+            labels = dict(labels)
+            bound = float(labels.pop('le'))
+            buckets[tuple(sorted(labels.items()))][bound] = value
+        for labels in sorted(values[f'{name}_count']):
+            cumulative = 0
+            for bound in LATENCY_BUCKETS:
+                cumulative += buckets[labels].get(bound, 0)
+                bucket_labels = (*labels, ('le', format_value(bound)))
+                lines.append(
+                    f'{name}_bucket{format_labels(bucket_labels)} '
+                    f'{format_value(cumulative)}'
+                )
+            for suffix in ('_sum', '_count'):
+                lines.append(
+                    f'{name}{suffix}{format_labels(labels)} '
+                    f'{format_value(values[name + suffix][labels])}'
+                )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,25 @@
+from core import fragments
+
+
+class DeferredFragmentMiddleware:
+    """
+    Подставляет отложенные фрагменты core.fragments в HTML-ответы
+    на запросы, отмеченные fragments.defer.
+    Стоит последним: фрагменты видят пользователя, а CSRF-cookie
+    формы комментария успевает выставить CsrfViewMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            fragments.is_deferred(request)
+            and not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+        ):
+            response.content = fragments.stitch(
+                request, response.content, response.charset
+            )
+        return response
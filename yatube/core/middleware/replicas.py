@@ -0,0 +1,42 @@
+from django.conf import settings
+
+from core import routers
+
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+class ReplicaMiddleware:
+    """
+    Отправляет чтения view из REPLICA_VIEWS на реплики базы.
+    После запроса с записью ставит cookie REPLICA_PIN_COOKIE
+    на REPLICA_LAG секунд: пока она есть, все запросы
+    пользователя читают из основной базы.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = routers.finish()
+        if wrote and settings.REPLICA_LAG:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_LAG,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method in SAFE_METHODS
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        ):
+            routers.allow_replicas()
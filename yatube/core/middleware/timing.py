@@ -0,0 +1,68 @@
+import json
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, timing
+
+
+logger = logging.getLogger(__name__)
+
+# Замеры core.timing, которые попадают в заголовок и в лог;
+# desc в Server-Timing — количество замеров (для db — число запросов)
+METRICS = ('db', 'template', 'thumbnails')
+
+
+def server_timing(timings, total):
+    """Значение заголовка Server-Timing, длительности в мс."""
+    parts = [
+        f'{name};dur={timings.durations[name] * 1000:.1f};'
+        f'desc="{timings.counts[name]}"'
+        for name in METRICS
+        if timings.counts[name]
+    ]
+    parts.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class TimingMiddleware:
+    """
+    Замеряет запрос: число и время запросов к БД, время рендера
+    шаблонов и обработки картинок, общее время. Отдает замеры
+    в заголовке Server-Timing и одной JSON-строкой в лог,
+    а при METRICS_ENABLED — в общие метрики core.metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.database_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            timing.finish()
+        total = timings.elapsed()
+        response['Server-Timing'] = server_timing(timings, total)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'queries': timings.counts['db'],
+                **{
+                    f'{name}_ms': round(timings.durations[name] * 1000, 1)
+                    for name in METRICS
+                },
+            }, ensure_ascii=False))
+        if settings.METRICS_ENABLED:
+            metrics.observe_request(request, response, timings, total)
+        return response
@@ -0,0 +1,82 @@
+"""
+Чтение с реплик базы. ReplicaMiddleware разрешает читать с реплик
+только view из REPLICA_VIEWS и только тем, кто не писал в базу сам
+в последние REPLICA_LAG секунд: пока реплики догоняют основную базу,
+пользователь должен видеть свои изменения. Запись и чтение после
+записи в том же запросе всегда идут в основную базу. С реплик
+читаются только модели приложений REPLICA_APPS, и только их запись
+закрепляет пользователя за основной базой: сессии и пользователи
+(в том числе время входа) всегда пишутся и читаются там.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+PRIMARY = 'default'
+
+_local = threading.local()
+
+
+def start(replicas_allowed=False):
+    _local.replicas_allowed = replicas_allowed
+    _local.wrote = False
+
+
+def allow_replicas():
+    _local.replicas_allowed = True
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтения внутри блока идут в основную базу. Так собирается все,
+    что кэшируется под текущими версиями: реплика могла еще не получить
+    изменения, сменившие эти версии.
+    """
+    allowed = getattr(_local, 'replicas_allowed', False)
+    _local.replicas_allowed = False
+    try:
+        yield
+    finally:
+        _local.replicas_allowed = allowed
+
+
+def finish():
+    """Завершает запрос; возвращает True, если в нем была запись."""
+    wrote = getattr(_local, 'wrote', False)
+    start()
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.READ_REPLICAS
+            or model._meta.app_label not in settings.REPLICA_APPS
+            or not getattr(_local, 'replicas_allowed', False)
+            or getattr(_local, 'wrote', False)
+        ):
+            return PRIMARY
+        instance = hints.get('instance')
+        # Связанные объекты читаются с той же реплики, что и сам объект
+        if (
+            instance is not None
+            and instance._state.db in settings.READ_REPLICAS
+        ):
+            return instance._state.db
+        return random.choice(settings.READ_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_APPS:
+            _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,25 @@
+"""
+Шаблонизатор Django, который засекает время рендера
+для core.timing. Вложенные шаблоны входят во время внешнего.
+"""
+from django.template.backends.django import DjangoTemplates, Template
+
+from core import timing
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timing.measure('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(
+            super().from_string(template_code).template, self
+        )
+
+    def get_template(self, template_name):
+        return TimedTemplate(
+            super().get_template(template_name).template, self
+        )
@@ -0,0 +1,15 @@
+from django import template
+
+from core import fragments
+
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def deferred(context, name, **params):
+    """Метка фрагмента, который подставится для каждого запроса."""
+    request = getattr(context, 'request', None)
+    if request is not None:
+        fragments.defer(request)
+    return fragments.marker(name, **params)
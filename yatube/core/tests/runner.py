@@ -0,0 +1,19 @@
+import logging
+import os
+
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Прогон тестов без журнала замеров запросов: он печатал бы строку
+    на каждый запрос тестового клиента. Уровень, явно заданный
+    в REQUEST_TIMING_LOG_LEVEL, не меняется.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if 'REQUEST_TIMING_LOG_LEVEL' not in os.environ:
+            logging.getLogger('core.middleware.timing').setLevel(
+                logging.WARNING
+            )
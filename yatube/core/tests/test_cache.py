@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from core.cache_backends.sqlite import SQLiteCache
+from core.tests.utils import TEST_STATE_DIR, TestCase
+
+
+def make_cache(location, **options):
+    return SQLiteCache(location, {'OPTIONS': options})
+
+
+def increment_many(location, times):
+    cache = make_cache(location)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+def try_lock(location, results):
+    results.put(make_cache(location).add('lock', os.getpid()))
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = make_cache(self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        """Базовые операции кэша."""
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertTrue(self.cache.has_key('key'))
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_expired_value_is_missing(self):
+        """Просроченное значение не отдается и может быть добавлено."""
+        self.cache.set('key', 'old', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        self.assertFalse(self.cache.add('key', 'newer'))
+        self.assertEqual(self.cache.get('key'), 'new')
+
+    def test_get_many_set_many(self):
+        """Пакетные операции."""
+        self.cache.set_many({'first': 1, 'second': 2})
+        self.assertEqual(
+            self.cache.get_many(['first', 'second', 'third']),
+            {'first': 1, 'second': 2}
+        )
+        self.cache.delete_many(['first', 'second'])
+        self.assertEqual(self.cache.get_many(['first', 'second']), {})
+
+    def test_incr(self):
+        """incr меняет значение и требует существующий ключ."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_lru_eviction(self):
+        """Вытесняются давно прочитанные записи."""
+        cache = make_cache(
+            self.location,
+            MAX_ENTRIES=4,
+            CULL_FREQUENCY=2,
+            CULL_EVERY=1,
+            ACCESS_RESOLUTION=0
+        )
+        for number in range(4):
+            cache.set(f'key{number}', number)
+        cache.get('key0')
+        cache.set('key4', 4)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key4'), 4)
+
+    def test_size_limit(self):
+        """Кэш не растет больше MAX_SIZE байт."""
+        cache = make_cache(self.location, MAX_SIZE=2048, CULL_EVERY=1)
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 512)
+        self.assertLess(len(cache.get_many(
+            [f'key{number}' for number in range(10)]
+        )), 10)
+
+    def test_shared_between_processes(self):
+        """incr и add атомарны для нескольких процессов."""
+        self.cache.set('counter', 0)
+        processes = [
+            multiprocessing.Process(
+                target=increment_many, args=(self.location, 50)
+            ) for _ in range(4)
+        ]
+        results = multiprocessing.Queue()
+        processes += [
+            multiprocessing.Process(
+                target=try_lock, args=(self.location, results)
+            ) for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+        self.assertEqual(
+            sorted(results.get() for _ in range(4)),
+            [False, False, False, True]
+        )
+
+
+class TestCacheLocationTest(TestCase):
+    def test_cache_is_outside_project(self):
+        """Тесты очищают кэш во временном каталоге, а не в проекте."""
+        self.assertEqual(
+            os.path.dirname(cache._location), TEST_STATE_DIR
+        )
+        self.assertFalse(cache._location.startswith(settings.BASE_DIR))
@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from core.tests.utils import TestCase, TransactionTestCase
+from core.db import atomic_write, retry_on_lock
+
+
+@override_settings(DB_LOCK_RETRIES=3, DB_LOCK_RETRY_DELAY=0)
+class SQLiteTests(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение получает настройки SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_retry_on_lock(self):
+        """Занятая база — запись повторяется до успеха."""
+        write = mock.Mock(side_effect=[
+            OperationalError('database is locked'),
+            'ok',
+        ])
+        write.__qualname__ = 'write'
+        with self.assertLogs('core.db', 'WARNING'):
+            result = retry_on_lock(write)()
+        self.assertEqual(result, 'ok')
+        self.assertEqual(write.call_count, 2)
+
+    def test_retry_gives_up(self):
+        """После DB_LOCK_RETRIES попыток ошибка пробрасывается."""
+        write = mock.Mock(side_effect=OperationalError('database is locked'))
+        write.__qualname__ = 'write'
+        with self.assertLogs('core.db', 'WARNING'):
+            with self.assertRaises(OperationalError):
+                retry_on_lock(write)()
+        self.assertEqual(write.call_count, 3)
+
+    def test_other_errors_not_retried(self):
+        """Другие ошибки базы не повторяются."""
+        write = mock.Mock(side_effect=OperationalError('no such table: x'))
+        with self.assertRaises(OperationalError):
+            retry_on_lock(write)()
+        self.assertEqual(write.call_count, 1)
+
+
+class TransactionModeTests(TransactionTestCase):
+    def begin(self, atomic):
+        with CaptureQueriesContext(connection) as context:
+            with atomic():
+                pass
+        return context.captured_queries[0]['sql']
+
+    def test_atomic_write_begins_immediate(self):
+        """Транзакция записи сразу берет блокировку записи."""
+        self.assertEqual(self.begin(atomic_write), 'BEGIN IMMEDIATE')
+
+    def test_atomic_begins_deferred(self):
+        """Обычная транзакция не берет блокировку записи заранее."""
+        self.assertEqual(self.begin(transaction.atomic), 'BEGIN')
+        self.assertEqual(self.begin(atomic_write), 'BEGIN IMMEDIATE')
+        self.assertEqual(self.begin(transaction.atomic), 'BEGIN')
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory
+from core import fragments
+from core.middleware.fragments import DeferredFragmentMiddleware
+from core.tests.utils import TestCase
+
+
+class DeferredFragmentMiddlewareTests(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+        self.request.user = AnonymousUser()
+        self.middleware = DeferredFragmentMiddleware(
+            lambda request: HttpResponse('<!--deferred:header-->')
+        )
+
+    def test_only_marked_requests_stitched(self):
+        """Без отметки тега {% deferred %} ответ не меняется."""
+        response = self.middleware(self.request)
+        self.assertEqual(response.content, b'<!--deferred:header-->')
+        fragments.defer(self.request)
+        response = self.middleware(self.request)
+        self.assertContains(response, 'Войти')
+
+    def test_unknown_fragment_rendered_empty(self):
+        """Метка неизвестного фрагмента заменяется пустой строкой."""
+        with self.assertLogs('core.fragments', 'ERROR'):
+            content = fragments.stitch(
+                self.request, b'<p><!--deferred:missing?id=1--></p>'
+            )
+        self.assertEqual(content, b'<p></p>')
@@ -0,0 +1,81 @@
+import multiprocessing
+import os
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from core.tests.utils import TestCase
+from django.urls import reverse
+from core import metrics
+from http import HTTPStatus
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+def count_in_other_process():
+    metrics.inc('yatube_thumbnails_generated_total', 3)
+    metrics.flush()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.flush()
+        if os.path.exists(settings.METRICS_LOCATION):
+            metrics._connection().execute('DELETE FROM metrics')
+
+    def scrape(self, **headers):
+        return self.client.get(reverse('metrics'), **headers)
+
+    def test_requests_are_aggregated_per_view(self):
+        """Гистограмма времени, запросы к БД и кэш страниц по view."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        content = self.scrape().content.decode()
+        lines = (
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2',
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_page_cache_responses_total'
+            '{result="hit",view="posts:index"} 1',
+            'yatube_page_cache_responses_total'
+            '{result="miss",view="posts:index"} 1',
+            '# TYPE yatube_db_queries_total counter',
+        )
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertIn(line, content.splitlines())
+
+    def test_metrics_from_other_processes_are_summed(self):
+        """Метрики других процессов попадают в общий файл."""
+        metrics.inc('yatube_thumbnails_generated_total', 2)
+        process = multiprocessing.get_context('fork').Process(
+            target=count_in_other_process
+        )
+        process.start()
+        process.join()
+        self.assertIn(
+            'yatube_thumbnails_generated_total 5',
+            self.scrape().content.decode().splitlines()
+        )
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        """С METRICS_TOKEN метрики отдаются только с токеном."""
+        cases = (
+            ({}, HTTPStatus.FORBIDDEN),
+            ({'HTTP_AUTHORIZATION': 'Bearer wrong'}, HTTPStatus.FORBIDDEN),
+            ({'HTTP_AUTHORIZATION': 'Bearer secret'}, HTTPStatus.OK),
+        )
+        for headers, status in cases:
+            with self.subTest(headers=headers):
+                self.assertEqual(self.scrape(**headers).status_code, status)
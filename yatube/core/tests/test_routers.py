@@ -0,0 +1,112 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import override_settings
+from core.tests.utils import ExtraDatabasesMixin, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import caching
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+@override_settings(READ_REPLICAS=['replica1'])
+class ReplicaRoutingTests(ExtraDatabasesMixin, TransactionTestCase):
+    # Реплика-зеркало видит только закоммиченные данные,
+    # поэтому тесты без общей транзакции
+    extra_databases = {'replica1': {'TEST': {'MIRROR': 'default'}}}
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Тестовый пост')
+        self.authorized_client = self.client_class()
+        self.authorized_client.force_login(self.user)
+
+    def get(self, client, url):
+        """Ответ и запросы к таблицам постов в основной базе и реплике."""
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica1']) as replica:
+                response = client.get(url)
+        return response, *(
+            [query for query in context if 'posts_' in query['sql']]
+            for context in (primary, replica)
+        )
+
+    def test_read_views_use_replica(self):
+        response, primary, replica = self.get(
+            self.authorized_client, reverse('posts:follow_index')
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(primary, [])
+        self.assertNotEqual(replica, [])
+
+    def test_cached_pages_rebuilt_from_primary(self):
+        """Страница для кэша под текущими версиями читается из основной."""
+        response, primary, replica = self.get(self.client, reverse(
+            'posts:post_detail', args=(self.post.pk,)
+        ))
+        self.assertContains(response, 'Тестовый пост')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+    def test_cards_from_replica_not_cached(self):
+        posts = Post.objects.using('replica1').all()
+        caching.render_post_cards(posts)
+        versions = caching.get_versions(
+            [caching.scope_users(), caching.scope_groups()]
+        )
+        key = caching.make_card_key(posts[0], versions, False, None)
+        self.assertIsNone(cache.get(key))
+        caching.render_post_cards(Post.objects.all())
+        self.assertIsNotNone(cache.get(key))
+
+    def test_write_pins_user_to_primary(self):
+        """После записи пользователь читает из основной базы."""
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            data={'text': 'Новый комментарий'}
+        )
+        self.assertEqual(
+            response.cookies[settings.REPLICA_PIN_COOKIE]['max-age'],
+            settings.REPLICA_LAG
+        )
+        response, primary, replica = self.get(
+            self.authorized_client, reverse('posts:follow_index')
+        )
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
+
+    def test_login_does_not_pin(self):
+        """Сессия и время входа не закрепляют за основной базой."""
+        self.user.set_password('password')
+        self.user.save()
+        response = self.client.post(
+            reverse('users:login'),
+            data={'username': 'auth', 'password': 'password'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    @override_settings(REPLICA_LAG=0)
+    def test_pinning_disabled(self):
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            data={'text': 'Новый комментарий'}
+        )
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_other_views_use_primary(self):
+        """View не из REPLICA_VIEWS читают из основной базы."""
+        response, primary, replica = self.get(
+            self.authorized_client,
+            reverse('posts:post_edit', args=(self.post.pk,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(primary, [])
+        self.assertEqual(replica, [])
@@ -0,0 +1,46 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from core.tests.utils import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+class TimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_response_has_server_timing(self):
+        """Ответ содержит замеры БД, шаблонов и общее время."""
+        response = self.client.get(reverse('posts:index'))
+        metrics = {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+        for name in ('db', 'template', 'total'):
+            with self.subTest(name=name):
+                self.assertIn(name, metrics)
+                self.assertIn(';dur=', metrics[name])
+
+    def test_request_is_logged_as_json(self):
+        """Замеры запроса пишутся в лог строкой JSON."""
+        with self.assertLogs('core.middleware.timing', 'INFO') as logs:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], reverse('posts:index'))
+        self.assertEqual(record['status'], response.status_code)
+        self.assertEqual(record['queries'], len(queries.captured_queries))
+        self.assertGreaterEqual(record['total_ms'], record['db_ms'])
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from core.tests.utils import TestCase
 from http import HTTPStatus
 
 
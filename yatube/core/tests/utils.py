@@ -0,0 +1,87 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+from django import test
+from django.conf import settings
+from django.db import connections
+from django.test import override_settings
+
+
+# Файлы общего состояния (кэш, метрики) на время прогона тестов:
+# тесты очищают их, и рабочие файлы проекта не должны пострадать.
+# Процессы пула миниатюр запускаются через spawn и читают настройки
+# заново, мимо override_settings, поэтому в тестах пула нет
+TEST_STATE_DIR = tempfile.mkdtemp(prefix='yatube-tests-')
+
+atexit.register(shutil.rmtree, TEST_STATE_DIR, ignore_errors=True)
+
+isolated_state = override_settings(
+    CACHES={
+        'default': {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(TEST_STATE_DIR, 'cache.sqlite3'),
+        },
+    },
+    METRICS_LOCATION=os.path.join(TEST_STATE_DIR, 'metrics.sqlite3'),
+    THUMBNAIL_WORKERS=0,
+)
+
+
+@isolated_state
+class TestCase(test.TestCase):
+    """TestCase с кэшем и метриками во временном каталоге прогона."""
+
+
+@isolated_state
+class TransactionTestCase(test.TransactionTestCase):
+    """
+    TransactionTestCase с кэшем и метриками во временном каталоге
+    прогона.
+    """
+
+
+class ExtraDatabasesMixin:
+    """
+    Базы extra_databases ({псевдоним: настройки поверх default})
+    есть только на время тестов класса: в настройках проекта их нет.
+    Базы без TEST MIRROR создаются и мигрируются заново; настройки
+    extra_databases_settings действуют и при миграции, и в тестах.
+    """
+    extra_databases = {}
+    extra_databases_settings = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.databases_override = override_settings(
+            **cls.extra_databases_settings
+        )
+        cls.databases_override.enable()
+        cls.created_databases = {}
+        for alias, options in cls.extra_databases.items():
+            connections.databases[alias] = {
+                **connections['default'].settings_dict,
+                **options,
+            }
+            connection = connections[alias]
+            if not connection.settings_dict['TEST']['MIRROR']:
+                cls.created_databases[alias] = connection.settings_dict['NAME']
+                connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True, serialize=False
+                )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        for alias in cls.extra_databases:
+            connection = connections[alias]
+            if alias in cls.created_databases:
+                connection.creation.destroy_test_db(
+                    cls.created_databases[alias], verbosity=0
+                )
+            connection.close()
+            delattr(connections._connections, alias)
+            del connections.databases[alias]
+        cls.databases_override.disable()
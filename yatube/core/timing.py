@@ -0,0 +1,65 @@
+"""
+Замеры времени внутри запроса: запросы к БД, рендер шаблонов,
+обработка картинок. Замеры копятся в объекте текущего потока,
+который создает TimingMiddleware; вне запроса measure ничего не делает.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+_local = threading.local()
+
+
+class Timings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.active = set()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def start():
+    _local.timings = Timings()
+    return _local.timings
+
+
+def finish():
+    timings = current()
+    _local.timings = None
+    return timings
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+@contextmanager
+def measure(name):
+    """
+    Добавляет длительность блока к замеру name.
+    Вложенные блоки с тем же именем (шаблон внутри шаблона)
+    не учитываются повторно.
+    """
+    timings = current()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[name] += time.perf_counter() - started
+        timings.counts[name] += 1
+        timings.active.discard(name)
+
+
+def database_wrapper(execute, sql, params, many, context):
+    """Обертка connection.execute_wrapper: время и число запросов."""
+    with measure('db'):
+        return execute(sql, params, many, context)
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from core import metrics
 
 
 def page_not_found(request, exception):
@@ -24,3 +29,21 @@ def server_error(request):
 def permission_denied(request, exception):
     """Кастомная страница ошибки 403 Forbidden."""
     return render(request, 'core/403.html', status=403)
+
+
+def metrics_page(request):
+    """
+    Метрики всех процессов в текстовом формате Prometheus.
+    Если задан METRICS_TOKEN, нужен заголовок
+    Authorization: Bearer <токен>.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponseForbidden()
+    metrics.flush()
+    return HttpResponse(
+        metrics.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,386 @@
+"""
+Версионированный кэш страниц.
+У каждой области (scope) страниц есть версия — время последнего
+изменения данных в микросекундах. Версии входят в ключ кэша
+и обновляются сигналами, поэтому страницы можно кэшировать надолго:
+после изменения данных они сразу собираются заново.
+
+Запись страницы хранит версии, с которыми она собрана, поэтому
+после изменения данных ее можно отдать как устаревшую копию,
+пока один запрос пересобирает страницу.
+
+Из тех же версий собираются ETag и Last-Modified: если у клиента
+актуальная копия, он получает 304 Not Modified без запросов к ленте
+и рендера шаблонов.
+
+То, что сохраняется под текущими версиями, читается из основной базы:
+реплика может отставать от изменений, сменивших версии, и устаревшая
+копия осталась бы в кэше до следующего изменения.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import Counter
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+
+from core import fragments, routers
+
+
+VERSION_PREFIX = 'page_version'
+
+STATS_PREFIX = 'page_cache_stats'
+
+CACHE_EVENTS = ('hit', 'miss', 'stale')
+
+CACHE_HEADER = 'X-Cache'
+
+CARD_PREFIX = 'post_card'
+
+CARD_TEMPLATE = 'includes/post.html'
+
+CARD_SEPARATOR = '\n<hr>\n'
+
+POST_AUTHOR_PREFIX = 'post_author'
+
+_events_lock = threading.Lock()
+_pending_events = Counter()
+_events_flushed = time.monotonic()
+
+
+def _reset_events_after_fork():
+    """Дочерний процесс не должен повторно записать события родителя."""
+    global _events_lock
+    _events_lock = threading.Lock()
+    _pending_events.clear()
+
+
+os.register_at_fork(after_in_child=_reset_events_after_fork)
+
+
+def scope_all():
+    return 'all'
+
+
+def scope_users():
+    return 'users'
+
+
+def scope_groups():
+    return 'groups'
+
+
+def scope_group(slug):
+    return f'group:{slug}'
+
+
+def scope_author(username):
+    return f'author:{username}'
+
+
+def scope_author_posts(author_id):
+    """Посты автора по id: от них зависит его счетчик на post_detail."""
+    return f'author_posts:{author_id}'
+
+
+def scope_post(post_id):
+    """Пост и комментарии к нему."""
+    return f'post:{post_id}'
+
+
+def make_version_key(scope):
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def new_version():
+    return time.time_ns() // 1000
+
+
+def get_versions(scopes):
+    """Текущие версии областей; недостающие создаются."""
+    keys = [make_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = new_version()
+            cache.add(key, versions[key], None)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(scopes):
+    """Отмечает изменение данных в областях."""
+    version = new_version()
+    cache.set_many(
+        {make_version_key(scope): version for scope in set(scopes)},
+        None
+    )
+
+
+def record_event(event):
+    """
+    Отмечает событие кэша страниц (hit, miss, stale). События копятся
+    в памяти процесса и уходят в кэш пачкой, не чаще раза
+    в PAGE_CACHE_STATS_FLUSH_INTERVAL секунд.
+    """
+    with _events_lock:
+        _pending_events[event] += 1
+    flush_events(force=False)
+
+
+def flush_events(force=True):
+    """Прибавляет накопленные события к счетчикам в кэше."""
+    global _events_flushed
+    interval = settings.PAGE_CACHE_STATS_FLUSH_INTERVAL
+    with _events_lock:
+        now = time.monotonic()
+        if not force and now - _events_flushed < interval:
+            return
+        _events_flushed = now
+        pending = dict(_pending_events)
+        _pending_events.clear()
+    for event, count in pending.items():
+        key = f'{STATS_PREFIX}:{event}'
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, count)
+
+
+def page_cache_stats():
+    """Счетчики попаданий, промахов и устаревших ответов кэша страниц."""
+    flush_events()
+    keys = {event: f'{STATS_PREFIX}:{event}' for event in CACHE_EVENTS}
+    values = cache.get_many(keys.values())
+    return {event: values.get(key, 0) for event, key in keys.items()}
+
+
+def make_page_key(key_prefix, request):
+    """
+    Ключ страницы: путь с параметрами. Персональные части страниц
+    подставляются отложенными фрагментами (core.fragments), поэтому
+    запись общая для всех пользователей.
+    """
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{key_prefix}:{path}'
+
+
+def remember_post_author(post):
+    """Автор поста не меняется, поэтому хранится в кэше бессрочно."""
+    cache.set(f'{POST_AUTHOR_PREFIX}:{post.pk}', post.author_id, None)
+
+
+def post_author_id(post_id):
+    """Автор поста из кэша или None, если пост еще не встречался."""
+    return cache.get(f'{POST_AUTHOR_PREFIX}:{post_id}')
+
+
+def make_etag(request, versions):
+    """
+    ETag страницы: адрес с параметрами (номер страницы или курсор),
+    пользователь и версии областей страницы. Страница пользователя
+    содержит CSRF-токен форм, который меняется при каждом входе,
+    поэтому он тоже входит в ETag: иначе браузер получил бы 304
+    и отправил бы форму со старым токеном.
+    """
+    user = ('anon',)
+    if request.user.is_authenticated:
+        user = (request.user.pk, request.META.get('CSRF_COOKIE', ''))
+    raw = ':'.join(map(str, (request.get_full_path(), *user, *versions)))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def validators(request, versions):
+    """
+    ETag и время последнего изменения областей (в секундах).
+    Last-Modified не различает пользователей, поэтому
+    отдается только анонимам.
+    """
+    last_modified = None
+    if not request.user.is_authenticated:
+        last_modified = max(versions) // 1_000_000
+    return make_etag(request, versions), last_modified
+
+
+def not_modified(request, versions):
+    """304 Not Modified, если копия клиента актуальна, иначе None."""
+    etag, last_modified = validators(request, versions)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+
+
+def set_validators(request, response, versions):
+    if response.status_code != HTTPStatus.OK:
+        return
+    etag, last_modified = validators(request, versions)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+
+def response_from_entry(request, entry, event):
+    # Записи без отметки сохранены до нее и могут содержать метки
+    if entry.get('deferred', True):
+        fragments.defer(request)
+    response = HttpResponse(entry['content'], status=entry['status'])
+    for header, value in entry['headers']:
+        response[header] = value
+    response[CACHE_HEADER] = event.upper()
+    record_event(event)
+    return response
+
+
+def store_response(request, key, response, versions):
+    """Сохраняет ответ, если его можно отдавать другим запросам."""
+    if response.status_code != HTTPStatus.OK or response.cookies:
+        return
+    cache.set(
+        key,
+        {
+            'versions': versions,
+            'fresh_until': time.time() + settings.PAGE_CACHE_SOFT_TIMEOUT,
+            'content': response.content,
+            'status': response.status_code,
+            'headers': list(response.items()),
+            'deferred': fragments.is_deferred(request),
+        },
+        settings.PAGE_CACHE_HARD_TIMEOUT
+    )
+
+
+def wait_for_entry(key, lock_key):
+    """
+    Ждет, пока запрос с блокировкой соберет страницу, которой нет
+    в кэше: опрашивает кэш раз в PAGE_CACHE_WAIT_INTERVAL секунд,
+    но не дольше PAGE_CACHE_WAIT_TIMEOUT. Возвращает запись
+    или None, если блокировка снята без записи или время вышло.
+    """
+    deadline = time.monotonic() + settings.PAGE_CACHE_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.PAGE_CACHE_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock_key) is None:
+            return None
+    return None
+
+
+def cache_page_versioned(key_prefix, scopes):
+    """
+    Кэш страниц с версиями областей в записи и защитой от лавины запросов.
+    scopes(request, *args, **kwargs) возвращает области страницы
+    или None, если их нельзя узнать без запросов к базе: тогда
+    страница собирается без кэша.
+
+    Запись свежая, пока не изменились версии ее областей
+    и не прошло PAGE_CACHE_SOFT_TIMEOUT секунд. Устаревшую запись
+    пересобирает только запрос, взявший короткую блокировку,
+    остальные до конца пересборки получают устаревшую копию.
+    Если копии нет совсем, они недолго ждут записи (wait_for_entry)
+    и собирают страницу сами, только если не дождались.
+    Совсем старые записи удаляются через PAGE_CACHE_HARD_TIMEOUT.
+    Ответы получают ETag и Last-Modified по версиям (устаревшая
+    копия — по своим), актуальная копия клиента — 304 до кэша.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(request, *args, **kwargs)
+            if page_scopes is None:
+                return view(request, *args, **kwargs)
+            versions = get_versions(page_scopes)
+            response = not_modified(request, versions)
+            if response is not None:
+                return response
+            key = make_page_key(key_prefix, request)
+            entry = cache.get(key)
+            if (
+                entry is not None
+                and entry['versions'] == versions
+                and entry['fresh_until'] > time.time()
+            ):
+                response = response_from_entry(request, entry, 'hit')
+                set_validators(request, response, versions)
+                return response
+            lock_key = f'{key}:lock'
+            locked = cache.add(
+                lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT
+            )
+            if not locked and entry is None:
+                entry = wait_for_entry(key, lock_key)
+            if not locked and entry is not None:
+                event = 'hit' if entry['versions'] == versions else 'stale'
+                response = response_from_entry(request, entry, event)
+                set_validators(request, response, entry['versions'])
+                return response
+            try:
+                if locked:
+                    with routers.primary_reads():
+                        response = view(request, *args, **kwargs)
+                    store_response(request, key, response, versions)
+                else:
+                    response = view(request, *args, **kwargs)
+            finally:
+                if locked:
+                    cache.delete(lock_key)
+            response[CACHE_HEADER] = 'MISS'
+            record_event('miss')
+            set_validators(request, response, versions)
+            return response
+        return wrapper
+    return decorator
+
+
+def make_card_key(post, versions, bool_flag, group):
+    """
+    Ключ карточки поста: id, отметка изменения поста, число комментариев,
+    версии пользователей и групп (имя автора и ссылка на группу)
+    и контекст, от которого зависит разметка.
+    """
+    stamp = post.updated.timestamp() if post.updated else ''
+    return ':'.join(map(str, (
+        CARD_PREFIX,
+        post.pk,
+        stamp,
+        post.comments_count,
+        *versions,
+        int(bool(bool_flag)),
+        int(bool(group)),
+    )))
+
+
+def render_post_cards(posts, bool_flag=False, group=None):
+    """
+    Собирает карточки постов: все готовые карточки берутся из кэша
+    одним запросом, недостающие рендерятся и сохраняются. Карточки
+    постов, прочитанных с реплики, не сохраняются.
+    """
+    posts = list(posts)
+    versions = get_versions([scope_users(), scope_groups()])
+    keys = [make_card_key(post, versions, bool_flag, group) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            cards[key] = render_to_string(
+                CARD_TEMPLATE,
+                {'post': post, 'bool_flag': bool_flag, 'group': group}
+            )
+            if post._state.db not in settings.READ_REPLICAS:
+                missing[key] = cards[key]
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return mark_safe(CARD_SEPARATOR.join(cards[key] for key in keys))
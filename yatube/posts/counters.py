@@ -0,0 +1,75 @@
+"""
+Денормализованные счетчики постов, комментариев и подписчиков
+в Group, Post и UserCounter: обновление и полный пересчет.
+"""
+from django.db import NotSupportedError
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import sharding
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+
+def shift(queryset, field, delta):
+    """Атомарно сдвигает счетчик field у строк queryset на delta."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gt': 0})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def shift_user(user_id, field, delta):
+    """Сдвигает счетчик пользователя, создавая строку при необходимости."""
+    counters = UserCounter.objects.filter(user_id=user_id)
+    if shift(counters, field, delta) or delta < 0:
+        return
+    UserCounter.objects.get_or_create(user_id=user_id)
+    shift(counters, field, delta)
+
+
+def shift_group(group_id, delta):
+    if group_id:
+        shift(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def shift_post(post_id, delta):
+    if post_id:
+        shift(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def count_of(model, field):
+    """Подзапрос: количество строк model, ссылающихся на OuterRef('pk')."""
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def recount():
+    """
+    Пересчитывает все счетчики по исходным таблицам.
+    Возвращает количество обновленных строк по моделям.
+    Подзапросы идут в основную базу, поэтому с шардами пересчет
+    обнулил бы счетчики постов и не выполняется.
+    """
+    if sharding.enabled():
+        raise NotSupportedError('Пересчет счетчиков не работает с шардами')
+    UserCounter.objects.bulk_create(
+        UserCounter(user_id=user_id)
+        for user_id in User.objects.filter(
+            counters__isnull=True
+        ).values_list('pk', flat=True)
+    )
+    return {
+        'groups': Group.objects.update(
+            posts_count=count_of(Post, 'group')
+        ),
+        'posts': Post.objects.update(
+            comments_count=count_of(Comment, 'post')
+        ),
+        'users': UserCounter.objects.update(
+            posts_count=count_of(Post, 'author'),
+            comments_count=count_of(Comment, 'author'),
+            followers_count=count_of(Follow, 'author'),
+            following_count=count_of(Follow, 'user'),
+        ),
+    }
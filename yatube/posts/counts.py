@@ -0,0 +1,97 @@
+"""
+Кэш количества постов по областям (scope): все посты и лента
+подписок пользователя. Для групп и авторов есть точные
+денормализованные счетчики (Group.posts_count, UserCounter.posts_count),
+кэш для них не нужен.
+Счетчик всех постов обновляется сигналами, а в ключ счетчика ленты
+входят версии постов авторов из подписок.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min, QuerySet
+
+from . import caching
+
+
+KEY_PREFIX = 'posts_count'
+
+
+def scope_all():
+    return 'all'
+
+
+def scope_feed(user_id, author_ids):
+    """
+    Лента подписок. Новый пост автора меняет версию его постов,
+    а подписка — набор авторов, и ключ становится другим:
+    обходить подписчиков автора не нужно.
+    """
+    author_ids = sorted(author_ids)
+    versions = caching.get_versions(
+        [caching.scope_author_posts(author_id) for author_id in author_ids]
+    )
+    digest = hashlib.md5(
+        repr(list(zip(author_ids, versions))).encode()
+    ).hexdigest()
+    return f'feed:{user_id}:{digest}'
+
+
+def make_key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def approximate_count(queryset, threshold):
+    """
+    Приблизительное количество для больших выборок.
+    Для всей таблицы — по диапазону первичных ключей,
+    для отфильтрованной выборки — «больше порога».
+    """
+    if queryset.query.has_filters():
+        return threshold + 1
+    bounds = queryset.aggregate(first=Min('pk'), last=Max('pk'))
+    return max(threshold, bounds['last'] - bounds['first'] + 1)
+
+
+def count_queryset(queryset):
+    """
+    Считает объекты выборки, но не дальше порога
+    POSTS_COUNT_APPROXIMATE_THRESHOLD: после него — приблизительно.
+    """
+    threshold = settings.POSTS_COUNT_APPROXIMATE_THRESHOLD
+    count = queryset.order_by()[:threshold + 1].count()
+    if count <= threshold:
+        return count
+    return approximate_count(queryset.order_by(), threshold)
+
+
+def is_approximate(count):
+    """Посчитано ли количество приблизительно (больше порога)."""
+    return count > settings.POSTS_COUNT_APPROXIMATE_THRESHOLD
+
+
+def get_count(scope, queryset):
+    """
+    Количество постов в scope: из кэша или по выборке queryset.
+    Вместо выборки можно передать объект со своим count(),
+    который сам ограничивает подсчет (feeds.FeedPosts).
+    """
+    key = make_key(scope)
+    count = cache.get(key)
+    if count is None:
+        count = (
+            count_queryset(queryset) if isinstance(queryset, QuerySet)
+            else queryset.count()
+        )
+        cache.add(key, count, settings.POSTS_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def change_count(scopes, delta):
+    """Сдвигает закэшированные счетчики; отсутствующие пересчитаются."""
+    for scope in scopes:
+        try:
+            cache.incr(make_key(scope), delta)
+        except ValueError:
+            pass
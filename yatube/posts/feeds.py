@@ -0,0 +1,332 @@
+"""
+Лента подписок с разветвлением при записи (fan-out on write).
+Новый пост сразу раскладывается в FeedEntry подписчиков автора,
+поэтому лента читается одним диапазоном по индексу.
+Посты авторов с очень большим числом подписчиков не раскладываются,
+а подмешиваются при чтении. Автор, переставший быть популярным,
+подмешивается, пока rebuild_feeds --backfill не дополнит ленты
+его подписчиков.
+При шардировании постов (posts.sharding) FeedEntry не ведется:
+посты подписок читаются из шардов и сливаются при показе.
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+
+from core.db import atomic_write
+
+from . import counts, sharding
+from .models import FeedEntry, Follow, Post, PostQuerySet, UserCounter
+from .utils import CursorPaginator
+
+
+def is_pulled(followers_count, backfill_pending):
+    """Подмешиваются ли посты автора при чтении, а не раскладываются."""
+    return bool(backfill_pending) or (
+        (followers_count or 0) > settings.FEED_FANOUT_MAX_FOLLOWERS
+    )
+
+
+def is_fan_out_author(author_id):
+    """Раскладываются ли посты автора по лентам подписчиков."""
+    counters = UserCounter.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'feed_backfill_pending'
+    ).first() or (0, False)
+    return not is_pulled(*counters)
+
+
+def followed_authors(user):
+    """
+    Авторы из подписок пользователя:
+    {id автора: подмешиваются ли его посты при чтении}.
+    """
+    return {
+        author_id: is_pulled(followers_count, backfill_pending)
+        for author_id, followers_count, backfill_pending
+        in Follow.objects.filter(user=user).values_list(
+            'author_id',
+            'author__counters__followers_count',
+            'author__counters__feed_backfill_pending'
+        )
+    }
+
+
+def pulled_author_ids(authors):
+    """
+    Популярные авторы из подписок (followed_authors):
+    их посты читаются при показе.
+    """
+    return [author_id for author_id, pulled in authors.items() if pulled]
+
+
+def trim_feed(user_id):
+    """Оставляет в ленте пользователя не больше FEED_MAX_ENTRIES записей."""
+    boundary = FeedEntry.objects.filter(
+        user_id=user_id
+    ).values_list('created', 'post_id')[
+        settings.FEED_MAX_ENTRIES:settings.FEED_MAX_ENTRIES + 1
+    ].first()
+    if boundary is None:
+        return
+    created, post_id = boundary
+    FeedEntry.objects.filter(
+        Q(created__lt=created) | Q(created=created, post_id__lte=post_id),
+        user_id=user_id
+    ).delete()
+
+
+def trim_follower_feeds(author_id):
+    """
+    Убирает из лент подписчиков автора по одной самой старой записи
+    сверх FEED_MAX_ENTRIES. Ленты обрезаются при каждой раскладке,
+    поэтому после добавления одного поста лишней бывает ровно одна запись.
+    """
+    overflow = FeedEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).values('pk')[
+        settings.FEED_MAX_ENTRIES:settings.FEED_MAX_ENTRIES + 1
+    ]
+    FeedEntry.objects.filter(
+        pk__in=Follow.objects.filter(
+            author_id=author_id
+        ).annotate(overflow=Subquery(overflow)).values('overflow')
+    ).delete()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if sharding.enabled():
+        return
+    if not is_fan_out_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post.pk, created=post.created)
+            for user_id in followers
+        ),
+        ignore_conflicts=True
+    )
+    trim_follower_feeds(post.author_id)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if sharding.enabled():
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created')[:settings.FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, post_id=post_id, created=created)
+            for post_id, created in posts
+        ),
+        ignore_conflicts=True
+    )
+    trim_feed(user_id)
+
+
+def backfill_followers(author_id, batch_size):
+    """
+    Добавляет последние посты автора в ленты всех его подписчиков.
+    Нужна, когда автор перестает быть популярным: пока он был
+    популярным, его посты подмешивались при чтении и в ленты
+    не раскладывались. Ленты дополняются порциями по batch_size
+    подписчиков, каждая порция — отдельной транзакцией.
+    """
+    if sharding.enabled():
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created')[:settings.FEED_MAX_ENTRIES])
+    last_user_id = 0
+    while True:
+        followers = list(Follow.objects.filter(
+            author_id=author_id, user_id__gt=last_user_id
+        ).order_by('user_id').values_list('user_id', flat=True)[:batch_size])
+        if not followers:
+            break
+        last_user_id = followers[-1]
+        with atomic_write():
+            FeedEntry.objects.bulk_create(
+                (
+                    FeedEntry(
+                        user_id=user_id, post_id=post_id, created=created
+                    )
+                    for user_id in followers
+                    for post_id, created in posts
+                ),
+                batch_size=settings.FEED_MAX_ENTRIES,
+                ignore_conflicts=True
+            )
+            for user_id in followers:
+                trim_feed(user_id)
+
+
+def backfill_pending_authors(batch_size):
+    """
+    Дополняет ленты подписчиков помеченных авторов, у которых
+    подписчиков стало не больше FEED_BACKFILL_MAX_FOLLOWERS.
+    Флаг снимается до дополнения: новые посты автора с этого момента
+    раскладываются сами, а повторы старых отбрасывает ignore_conflicts.
+    Возвращает количество авторов.
+    """
+    if sharding.enabled():
+        return 0
+    authors = list(UserCounter.objects.filter(
+        feed_backfill_pending=True,
+        followers_count__lte=settings.FEED_BACKFILL_MAX_FOLLOWERS
+    ).values_list('user_id', flat=True))
+    for author_id in authors:
+        UserCounter.objects.filter(user_id=author_id).update(
+            feed_backfill_pending=False
+        )
+        backfill_followers(author_id, batch_size)
+    return len(authors)
+
+
+def lose_follower(user_id, author_id):
+    """
+    Отписка: посты автора убираются из ленты. Если автор перестал
+    быть популярным, он только помечается: ленты оставшихся
+    подписчиков дополняет backfill_pending_authors, а до тех пор
+    его посты подмешиваются при чтении.
+    """
+    remove_author(user_id, author_id)
+    UserCounter.objects.filter(
+        user_id=author_id,
+        followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_backfill_pending=True)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    if sharding.enabled():
+        return
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """
+    Заново собирает ленту пользователя по его подпискам:
+    последние FEED_MAX_ENTRIES постов всех авторов одним запросом.
+    """
+    if sharding.enabled():
+        return
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).values_list('pk', 'created')[:settings.FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        FeedEntry(user_id=user_id, post_id=post_id, created=created)
+        for post_id, created in posts
+    )
+
+
+def followed_posts(authors):
+    """Посты всех авторов из подписок (followed_authors)."""
+    return Post.objects.for_cards().filter(author_id__in=list(authors))
+
+
+def card_entries(user):
+    """Записи ленты пользователя с полями карточек их постов."""
+    return FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).only('created', 'post', *(
+        f'post__{field}' for field in PostQuerySet.CARD_FIELDS
+    ))
+
+
+class FeedPosts:
+    """
+    Лента для нумерованной паджинации. Срез читает диапазон
+    FeedEntry пользователя по индексу (user, created, post) вместе
+    с постами; посты популярных авторов подмешиваются из их диапазона.
+    """
+
+    def __init__(self, user, authors):
+        self.user = user
+        self.authors = authors
+
+    def count(self):
+        """Количество записей ленты и постов популярных авторов."""
+        count = counts.count_queryset(FeedEntry.objects.filter(user=self.user))
+        pulled = pulled_author_ids(self.authors)
+        if pulled:
+            count += counts.count_queryset(
+                Post.objects.filter(author_id__in=pulled)
+            )
+        return count
+
+    def __getitem__(self, index):
+        entries = card_entries(self.user)
+        pulled = pulled_author_ids(self.authors)
+        if not pulled:
+            return [entry.post for entry in entries[index]]
+        # Со смещением: первые index.stop записей обоих диапазонов
+        posts = [
+            *(entry.post for entry in entries[:index.stop]),
+            *Post.objects.for_cards().filter(
+                author_id__in=pulled
+            )[:index.stop],
+        ]
+        merged = {post.pk: post for post in posts}
+        return sorted(
+            merged.values(),
+            key=lambda post: (post.created, post.pk),
+            reverse=True
+        )[index]
+
+
+def feed_posts(user, authors):
+    """Лента для нумерованной паджинации."""
+    if sharding.enabled():
+        return followed_posts(authors)
+    return FeedPosts(user, authors)
+
+
+class FeedPaginator(CursorPaginator):
+    """
+    Курсорная паджинация ленты: диапазон FeedEntry пользователя
+    и, если есть подписки на популярных авторов, диапазон их постов.
+    Курсоры совпадают с курсорами постов, ключ — (created, id) поста.
+    Подписки (followed_authors) можно передать в authors,
+    иначе они читаются при выборке.
+    """
+
+    def __init__(self, object_list, per_page, user, authors=None):
+        super().__init__(object_list, per_page)
+        self.user = user
+        self.authors = authors
+
+    def fetch(self, position, backwards, limit):
+        if self.authors is None:
+            self.authors = followed_authors(self.user)
+        if sharding.enabled():
+            return CursorPaginator(
+                followed_posts(self.authors), limit
+            ).fetch(position, backwards, limit)
+        entries = CursorPaginator(
+            card_entries(self.user),
+            limit,
+            ordering=('-created', '-post_id')
+        ).fetch(position, backwards, limit)
+        posts = [entry.post for entry in entries]
+        authors = pulled_author_ids(self.authors)
+        if not authors:
+            return posts
+        pulled = CursorPaginator(
+            Post.objects.for_cards().filter(author_id__in=authors),
+            limit
+        ).fetch(position, backwards, limit)
+        merged = {post.pk: post for post in [*posts, *pulled]}
+        return sorted(
+            merged.values(),
+            key=self.key,
+            reverse=not backwards
+        )[:limit]
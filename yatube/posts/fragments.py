@@ -0,0 +1,50 @@
+"""Персональные фрагменты страниц постов, см. core.fragments."""
+from django.template.loader import render_to_string
+
+from core.fragments import fragment
+from .forms import CommentForm
+from .models import Follow
+
+
+@fragment('switcher')
+def switcher(request):
+    return render_to_string('includes/switcher.html', request=request)
+
+
+@fragment('follow_button')
+def follow_button(request, username):
+    user = request.user
+    following = (
+        user.is_authenticated
+        and user.username != username
+        and Follow.objects.filter(
+            user=user,
+            author__username=username
+        ).exists()
+    )
+    return render_to_string(
+        'includes/follow_button.html',
+        {'username': username, 'following': following},
+        request
+    )
+
+
+@fragment('comment_form')
+def comment_form(request, post_id):
+    return render_to_string(
+        'includes/comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()},
+        request
+    )
+
+
+@fragment('post_edit_button')
+def post_edit_button(request, post_id, author_id):
+    return render_to_string(
+        'includes/post_edit_button.html',
+        {
+            'post_id': post_id,
+            'is_author': str(request.user.pk) == author_id,
+        },
+        request
+    )
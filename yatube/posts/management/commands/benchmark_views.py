@@ -0,0 +1,166 @@
+import json
+import math
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+ROW = '{:<40} {:>9} {:>9} {:>9}'
+
+
+def percentile(values, percent):
+    """Процентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p95 времени ответа и число запросов к БД '
+        'страниц постов на разной глубине паджинации и сравнивает '
+        'с сохраненными результатами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=20,
+            help='Запросов на каждую страницу.'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[1, 10, 100],
+            help='Номера страниц (?page=) для лент.'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Очищать кэш перед каждым запросом.'
+        )
+        parser.add_argument(
+            '--save-baseline',
+            metavar='PATH',
+            help='Сохранить результаты в JSON-файл.'
+        )
+        parser.add_argument(
+            '--baseline',
+            metavar='PATH',
+            help='Сравнить с результатами из JSON-файла.'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=1.25,
+            help='Во сколько раз p95 может вырасти без ошибки.'
+        )
+
+    def targets(self, pages):
+        """Пары (название, адрес) для замера на самых больших данных."""
+        group = Group.objects.order_by('-posts_count').first()
+        author = User.objects.order_by('-counters__posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        feeds = [('posts:index', reverse('posts:index'))]
+        if group is not None:
+            feeds.append((
+                'posts:group_list',
+                reverse('posts:group_list', args=(group.slug,))
+            ))
+        if author is not None:
+            feeds.append((
+                'posts:profile',
+                reverse('posts:profile', args=(author.username,))
+            ))
+        feeds.append(('posts:follow_index', reverse('posts:follow_index')))
+        targets = [
+            (f'{name}?page={page}', f'{url}?page={page}')
+            for name, url in feeds
+            for page in pages
+        ]
+        if post is not None:
+            targets.append((
+                'posts:post_detail',
+                reverse('posts:post_detail', args=(post.pk,))
+            ))
+        return targets
+
+    def measure(self, client, url, requests, cold):
+        durations = []
+        queries = []
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = client.get(url)
+                durations.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(context.captured_queries))
+        return {
+            'p50_ms': round(percentile(durations, 50) * 1000, 2),
+            'p95_ms': round(percentile(durations, 95) * 1000, 2),
+            'queries': max(queries),
+        }
+
+    def regressions(self, results, baseline, tolerance):
+        for name, result in results.items():
+            before = baseline.get(name)
+            if before is None:
+                continue
+            if result['p95_ms'] > before['p95_ms'] * tolerance:
+                yield (
+                    f'{name}: p95 {result["p95_ms"]} мс, '
+                    f'было {before["p95_ms"]} мс'
+                )
+            if result['queries'] > before['queries']:
+                yield (
+                    f'{name}: запросов {result["queries"]}, '
+                    f'было {before["queries"]}'
+                )
+
+    def handle(self, *args, **options):
+        reader = User.objects.order_by('-counters__following_count').first()
+        if reader is None:
+            raise CommandError('Нет пользователей: запустите seed_data.')
+        client = Client()
+        client.force_login(reader)
+        results = {}
+        self.stdout.write(
+            ROW.format('страница', 'p50, мс', 'p95, мс', 'запросов')
+        )
+        for name, url in self.targets(options['pages']):
+            result = self.measure(
+                client, url, options['requests'], options['cold']
+            )
+            results[name] = result
+            self.stdout.write(ROW.format(
+                name, result['p50_ms'], result['p95_ms'], result['queries']
+            ))
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+        if not options['baseline']:
+            return
+        with open(options['baseline']) as file:
+            baseline = json.load(file)
+        regressions = list(
+            self.regressions(results, baseline, options['tolerance'])
+        )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
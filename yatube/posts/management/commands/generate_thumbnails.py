@@ -0,0 +1,37 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import close_connections, generate
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для уже загруженных картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Количество процессов (по умолчанию — по числу ядер).'
+        )
+
+    def handle(self, *args, **options):
+        images = list(
+            Post.objects.exclude(image='').exclude(
+                image__isnull=True
+            ).values_list('image', flat=True).distinct()
+        )
+        close_connections()
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            initializer=close_connections
+        ) as executor:
+            for number, image in enumerate(
+                executor.map(generate, images), start=1
+            ):
+                self.stdout.write(f'[{number}/{len(images)}] {image}')
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано картинок: {len(images)}')
+        )
@@ -0,0 +1,332 @@
+import http.client
+import multiprocessing
+import random
+import socket
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlencode
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from posts.management.commands.benchmark_views import percentile
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+SCENARIOS = ('anon', 'feed', 'comment', 'post')
+
+DEFAULT_MIX = 'anon=70,feed=20,comment=7,post=3'
+
+ROW = '{:<10} {:>8} {:>8} {:>9} {:>9} {:>9} {:>9}'
+
+
+def parse_mix(value):
+    """'anon=70,feed=20' -> {'anon': 70, 'feed': 20}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise CommandError(
+                f'Неизвестный сценарий {name!r}, есть: {", ".join(SCENARIOS)}'
+            )
+        try:
+            mix[name] = int(weight)
+        except ValueError:
+            raise CommandError(f'Вес сценария {name!r} должен быть числом')
+    if sum(mix.values()) <= 0:
+        raise CommandError('Сумма весов сценариев должна быть больше нуля')
+    return mix
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(listener, application):
+    """Воркер: принимает соединения с общего сокета и обслуживает их."""
+    connections.close_all()
+    server = WSGIServer(
+        listener.getsockname(), QuietHandler, bind_and_activate=False
+    )
+    server.socket = listener
+    server.server_name, server.server_port = listener.getsockname()
+    server.setup_environ()
+    server.set_app(application)
+    server.serve_forever()
+
+
+class LoadClient:
+    """Один клиент нагрузки: шлет запросы по смеси сценариев."""
+
+    def __init__(self, port, plan, sessions, rng):
+        self.port = port
+        self.plan = plan
+        self.sessions = sessions
+        self.rng = rng
+
+    def request(self, method, path, session=None, form=None):
+        headers = {}
+        body = None
+        if session is not None:
+            session_key, csrf_token = session
+            headers['Cookie'] = (
+                f'{settings.SESSION_COOKIE_NAME}={session_key}; '
+                f'{settings.CSRF_COOKIE_NAME}={csrf_token}'
+            )
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        connection = http.client.HTTPConnection(
+            '127.0.0.1', self.port, timeout=30
+        )
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status, response.getheader('X-Cache')
+        finally:
+            connection.close()
+
+    def run(self, scenario):
+        rng = self.rng
+        if scenario == 'anon':
+            return self.request('GET', rng.choice(self.plan['read_paths']))
+        session = rng.choice(self.sessions)
+        if scenario == 'feed':
+            return self.request('GET', self.plan['feed_path'], session)
+        form = {
+            'csrfmiddlewaretoken': session[1],
+            'text': f'Нагрузочный тест {rng.random()}',
+        }
+        if scenario == 'comment':
+            path = rng.choice(self.plan['comment_paths'])
+        else:
+            path = self.plan['create_path']
+        return self.request('POST', path, session, form)
+
+
+def run_client(port, plan, sessions, mix, deadline, seed, results):
+    """Процесс нагрузки: до deadline выполняет сценарии по весам."""
+    rng = random.Random(seed)
+    client = LoadClient(port, plan, sessions, rng)
+    names, weights = zip(*mix.items())
+    samples = []
+    while time.time() < deadline:
+        scenario = rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status, cache_result = client.run(scenario)
+        except (OSError, http.client.HTTPException) as error:
+            status, cache_result = type(error).__name__, None
+        samples.append(
+            (scenario, time.perf_counter() - started, status, cache_result)
+        )
+    results.put(samples)
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает приложение под WSGI-сервером с несколькими '
+        'процессами и нагружает его смесью чтений и записей. '
+        'Записи (комментарии и посты) попадают в настоящую базу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Процессов WSGI-сервера.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Одновременных клиентов (процессов нагрузки).'
+        )
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=30,
+            help='Длительность нагрузки в секундах.'
+        )
+        parser.add_argument(
+            '--mix',
+            type=parse_mix,
+            default=DEFAULT_MIX,
+            help=f'Веса сценариев {", ".join(SCENARIOS)} '
+                 f'(по умолчанию {DEFAULT_MIX}).'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=50,
+            help='Сколько пользователей входят для feed и записей.'
+        )
+        parser.add_argument('--port', type=int, default=0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def plan(self, rng):
+        """Адреса сценариев, выбранные из данных в базе."""
+        post_ids = list(
+            Post.objects.values_list('pk', flat=True)[:1000]
+        )
+        if not post_ids:
+            raise CommandError('Нет постов: запустите seed_data.')
+        slugs = list(Group.objects.values_list('slug', flat=True)[:50])
+        authors = list(User.objects.filter(
+            counters__posts_count__gt=0
+        ).values_list('username', flat=True)[:50])
+        read_paths = [
+            f'{reverse("posts:index")}?page={page}' for page in range(1, 6)
+        ]
+        read_paths += [
+            reverse('posts:group_list', args=(slug,)) for slug in slugs
+        ]
+        read_paths += [
+            reverse('posts:profile', args=(username,))
+            for username in authors
+        ]
+        read_paths += [
+            reverse('posts:post_detail', args=(post_id,))
+            for post_id in rng.sample(post_ids, min(len(post_ids), 100))
+        ]
+        return {
+            'read_paths': read_paths,
+            'feed_path': reverse('posts:follow_index'),
+            'create_path': reverse('posts:post_create'),
+            'comment_paths': [
+                reverse('posts:add_comment', args=(post_id,))
+                for post_id in post_ids
+            ],
+        }
+
+    def login(self, count):
+        """Сессии и CSRF-токены для пользователей с подписками."""
+        users = User.objects.order_by('-counters__following_count')[:count]
+        if not users:
+            raise CommandError('Нет пользователей: запустите seed_data.')
+        sessions = []
+        for user in users:
+            session = SessionStore()
+            session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            # Одна и та же строка в cookie и в форме проходит проверку CSRF
+            sessions.append((session.session_key, get_random_string(32)))
+        return sessions
+
+    def handle(self, *args, **options):
+        from yatube.wsgi import application
+
+        rng = random.Random(options['seed'])
+        plan = self.plan(rng)
+        sessions = self.login(options['users'])
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', options['port']))
+        listener.listen(128)
+        port = listener.getsockname()[1]
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        servers = [
+            context.Process(target=serve, args=(listener, application))
+            for _ in range(options['workers'])
+        ]
+        for server in servers:
+            server.start()
+        results = context.Queue()
+        deadline = time.time() + options['duration']
+        clients = [
+            context.Process(target=run_client, args=(
+                port, plan, sessions, options['mix'], deadline,
+                options['seed'] + number, results
+            ))
+            for number in range(options['concurrency'])
+        ]
+        self.stdout.write(
+            f'Сервер 127.0.0.1:{port}, процессов: {options["workers"]}, '
+            f'клиентов: {options["concurrency"]}, '
+            f'{options["duration"]:g} с'
+        )
+        try:
+            for client in clients:
+                client.start()
+            timeout = options['duration'] + 60
+            samples = [
+                sample
+                for _ in clients
+                for sample in results.get(timeout=timeout)
+            ]
+            for client in clients:
+                client.join()
+        finally:
+            for server in servers:
+                server.terminate()
+                server.join()
+            listener.close()
+        self.report(samples, options['duration'], options['workers'])
+
+    def report(self, samples, duration, workers):
+        by_scenario = defaultdict(list)
+        for sample in samples:
+            by_scenario[sample[0]].append(sample)
+        self.stdout.write(ROW.format(
+            'сценарий', 'запросов', 'ошибок', 'rps', 'p50, мс', 'p95, мс',
+            'p99, мс'
+        ))
+        for scenario in (*SCENARIOS, 'всего'):
+            rows = samples if scenario == 'всего' else by_scenario[scenario]
+            if not rows:
+                continue
+            latencies = [latency for _, latency, _, _ in rows]
+            errors = sum(1 for _, _, status, _ in rows if self.failed(status))
+            self.stdout.write(ROW.format(
+                scenario,
+                len(rows),
+                errors,
+                round(len(rows) / duration, 1),
+                *(
+                    round(percentile(latencies, percent) * 1000, 1)
+                    for percent in (50, 95, 99)
+                )
+            ))
+        self.stdout.write(
+            f'На процесс сервера: '
+            f'{round(len(samples) / duration / workers, 1)} rps'
+        )
+        statuses = Counter(status for _, _, status, _ in samples)
+        self.stdout.write('Ответы: ' + ', '.join(
+            f'{status}: {count}' for status, count in sorted(
+                statuses.items(), key=lambda item: str(item[0])
+            )
+        ))
+        cache_results = Counter(
+            cache_result for scenario, _, _, cache_result in samples
+            if scenario == 'anon' and cache_result
+        )
+        reads = sum(cache_results.values())
+        if reads:
+            self.stdout.write('Кэш страниц: ' + ', '.join(
+                f'{result} {count * 100 / reads:.0f}%'
+                for result, count in sorted(cache_results.items())
+            ))
+
+    @staticmethod
+    def failed(status):
+        """Ошибка — исключение клиента или ответ 4xx/5xx."""
+        return not isinstance(status, int) or status >= 400
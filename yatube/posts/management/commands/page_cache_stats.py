@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.caching import page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает счетчики попаданий и промахов кэша страниц.'
+
+    def handle(self, *args, **options):
+        stats = page_cache_stats()
+        for event, value in stats.items():
+            self.stdout.write(f'{event}: {value}')
+        requests = sum(stats.values())
+        if requests:
+            ratio = (stats['hit'] + stats['stale']) / requests
+            self.stdout.write(f'hit ratio: {ratio:.2%}')
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core.db import atomic_write
+from posts import feeds
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Заново собирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Пользователи, чьи ленты нужно собрать (по умолчанию все).'
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help=(
+                'Только дополнить ленты подписчиков авторов, '
+                'переставших быть популярными.'
+            )
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.FEED_BACKFILL_BATCH_SIZE,
+            help='Сколько лент дополнять в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            authors = feeds.backfill_pending_authors(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Дополнены ленты подписчиков авторов: {authors}'
+            ))
+            return
+        users = User.objects.filter(follower__isnull=False).distinct()
+        if options['usernames']:
+            users = User.objects.filter(username__in=options['usernames'])
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            with atomic_write():
+                feeds.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Собрано лент: {rebuilt}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import atomic_write
+from posts import search, sharding
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов.'
+
+    def handle(self, *args, **options):
+        if sharding.enabled():
+            raise CommandError(
+                'Перестройка индекса не работает с шардами (POST_SHARDS)'
+            )
+        with atomic_write():
+            indexed = search.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {indexed}')
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import atomic_write
+from posts import sharding
+from posts.counters import recount
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики постов, '
+        'комментариев и подписчиков.'
+    )
+
+    def handle(self, *args, **options):
+        if sharding.enabled():
+            raise CommandError(
+                'Пересчет счетчиков не работает с шардами (POST_SHARDS)'
+            )
+        with atomic_write():
+            updated = recount()
+        for name, rows in updated.items():
+            self.stdout.write(f'{name}: обновлено строк {rows}')
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db import atomic_write
+from posts import search, sharding
+from posts.models import Comment, FeedEntry, Post, PostKey
+
+
+def copy_rows(model, objects, using):
+    """
+    Вставляет строки как есть: raw-вставка не трогает поля
+    с auto_now и auto_now_add, поэтому даты сохраняются.
+    """
+    fields = model._meta.concrete_fields
+    batch_size = connections[using].ops.bulk_batch_size(fields, objects)
+    for start in range(0, len(objects), batch_size):
+        model._base_manager._insert(
+            objects[start:start + batch_size],
+            fields=fields,
+            raw=True,
+            using=using
+        )
+
+
+def unindex(ids, using):
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {search.TABLE} WHERE rowid IN ({placeholders})',
+            ids
+        )
+
+
+def move(posts, source, target):
+    """
+    Переносит посты, их комментарии и поисковый индекс
+    из source в target.
+    Сначала строки вставляются в target, потом удаляются из source,
+    поэтому повторный запуск после сбоя ничего не теряет.
+    """
+    ids = [post.pk for post in posts]
+    comments = list(Comment.objects.using(source).filter(post_id__in=ids))
+    PostKey.objects.bulk_create(
+        (PostKey(pk=post.pk, author_id=post.author_id) for post in posts),
+        ignore_conflicts=True
+    )
+    with atomic_write(using=target):
+        # Копии от прерванного запуска
+        Comment.objects.using(target).filter(
+            post_id__in=ids
+        )._raw_delete(target)
+        Post.objects.using(target).filter(pk__in=ids)._raw_delete(target)
+        unindex(ids, target)
+        copy_rows(Post, posts, target)
+        copy_rows(Comment, comments, target)
+        with connections[target].cursor() as cursor:
+            search.insert_rows(cursor, [
+                (post.pk, search.index_text(post.text)) for post in posts
+            ])
+    # Без сигналов: счетчики и кэши страниц не меняются от переноса
+    with atomic_write(using=source):
+        FeedEntry.objects.using(source).filter(
+            post_id__in=ids
+        )._raw_delete(source)
+        Comment.objects.using(source).filter(
+            post_id__in=ids
+        )._raw_delete(source)
+        Post.objects.using(source).filter(pk__in=ids)._raw_delete(source)
+        unindex(ids, source)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты и комментарии в шарды их авторов по текущему '
+        'POST_SHARDS: из основной базы и из всех шардов, в том числе '
+        'выведенных из работы через POST_SHARD_COUNT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def drain(self, source, batch_size):
+        """Переносит из source посты, которым место в другом шарде."""
+        moved = 0
+        last_pk = 0
+        while True:
+            posts = list(Post.objects.using(source).filter(
+                pk__gt=last_pk
+            ).order_by('pk')[:batch_size])
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+            by_shard = defaultdict(list)
+            for post in posts:
+                target = sharding.shard_for(post.author_id)
+                if target != source:
+                    by_shard[target].append(post)
+            for target, batch in by_shard.items():
+                move(batch, source, target)
+                moved += len(batch)
+            self.stdout.write(f'\r{source}: {moved}', ending='')
+        self.stdout.write('')
+        return moved
+
+    def handle(self, *args, **options):
+        if not sharding.enabled():
+            raise CommandError('Шардирование выключено: задайте шарды.')
+        moved = sum(
+            self.drain(source, options['batch_size'])
+            for source in ['default', *settings.SHARD_DATABASES]
+        )
+        self.stdout.write(self.style.SUCCESS(f'Перенесено постов: {moved}'))
@@ -0,0 +1,153 @@
+import random
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+
+from core.db import atomic_write
+from posts import counters, feeds, search, sharding
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+WORDS = (
+    'новости', 'важный', 'сегодня', 'погода', 'город', 'программирование',
+    'python', 'django', 'книга', 'прогулка', 'парк', 'осень', 'музыка',
+    'фотография', 'путешествие', 'работа', 'проект', 'кофе', 'вечер',
+    'друзья', 'кино', 'спорт', 'море', 'горы', 'история', 'наука',
+)
+
+# Подписки распределены неравномерно: у немногих авторов
+# очень много подписчиков, как в настоящей соцсети
+AUTHOR_SKEW = 3
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками для нагрузочных замеров.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--follows', type=int, default=10_000_000)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора, чтобы данные повторялись.'
+        )
+        parser.add_argument(
+            '--skip-feeds',
+            action='store_true',
+            help='Не собирать ленты подписок (это самый долгий шаг).'
+        )
+
+    def insert(self, model, rows, batch_size, **kwargs):
+        total = 0
+        for batch in batched(rows, batch_size):
+            with atomic_write():
+                model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+            self.stdout.write(
+                f'\r{model._meta.verbose_name_plural}: {total}', ending=''
+            )
+        self.stdout.write('')
+
+    def text(self, rng):
+        return ' '.join(rng.choices(WORDS, k=rng.randint(5, 40))).capitalize()
+
+    def handle(self, *args, **options):
+        # Счетчики и индекс пересчитываются по основной базе
+        if sharding.enabled():
+            raise CommandError(
+                'Заполняйте базу без шардов (POST_SHARDS) '
+                'и разносите посты командой reshard'
+            )
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = f'seed{User.objects.count()}_'
+
+        # Одинаковый непригодный пароль: хэшировать 100 тысяч паролей долго
+        self.insert(User, (
+            User(username=f'{prefix}{number}', password='!')
+            for number in range(options['users'])
+        ), batch_size)
+        self.insert(Group, (
+            Group(
+                title=f'Группа {prefix}{number}',
+                slug=f'{prefix.replace("_", "-")}{number}',
+                description=self.text(rng)
+            )
+            for number in range(options['groups'])
+        ), batch_size)
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        group_ids = [None, *Group.objects.values_list('pk', flat=True)]
+
+        def author_id():
+            return user_ids[int(len(user_ids) * rng.random() ** AUTHOR_SKEW)]
+
+        self.insert(Post, (
+            Post(
+                author_id=author_id(),
+                group_id=rng.choice(group_ids),
+                text=self.text(rng)
+            )
+            for _ in range(options['posts'])
+        ), batch_size)
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        if post_ids:
+            self.insert(Comment, (
+                Comment(
+                    post_id=rng.choice(post_ids),
+                    author_id=rng.choice(user_ids),
+                    text=self.text(rng)
+                )
+                for _ in range(options['comments'])
+            ), batch_size)
+        self.insert(Follow, (
+            Follow(user_id=user_id, author_id=author)
+            for user_id, author in (
+                (rng.choice(user_ids), author_id())
+                for _ in range(options['follows'])
+            )
+            if user_id != author
+        ), batch_size, ignore_conflicts=True)
+
+        # bulk_create не вызывает сигналы: производные данные
+        # пересчитываются целиком
+        self.stdout.write('Пересчет счетчиков')
+        with atomic_write():
+            counters.recount()
+        self.stdout.write('Построение поискового индекса')
+        with atomic_write():
+            search.rebuild()
+        if not options['skip_feeds']:
+            followers = list(Follow.objects.values_list(
+                'user_id', flat=True
+            ).distinct())
+            rebuilt = 0
+            for batch in batched(followers, batch_size):
+                with atomic_write():
+                    for user_id in batch:
+                        feeds.rebuild(user_id)
+                rebuilt += len(batch)
+                self.stdout.write(f'\rЛенты: {rebuilt}', ending='')
+            self.stdout.write('')
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
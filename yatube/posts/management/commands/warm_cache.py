@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.handlers.wsgi import WSGIHandler
+
+from posts import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кэш страниц: первые страницы ленты, самые '
+        'активные группы и профили самых читаемых авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--index-pages',
+            type=int,
+            default=settings.CACHE_WARMUP_INDEX_PAGES,
+            help='Сколько первых страниц index прогреть.'
+        )
+        parser.add_argument(
+            '--groups',
+            type=int,
+            default=settings.CACHE_WARMUP_GROUPS,
+            help='Сколько групп с наибольшим числом постов прогреть.'
+        )
+        parser.add_argument(
+            '--authors',
+            type=int,
+            default=settings.CACHE_WARMUP_AUTHORS,
+            help='Сколько профилей авторов с наибольшим числом '
+                 'подписчиков прогреть.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.CACHE_WARMUP_WORKERS,
+            help='Одновременных запросов.'
+        )
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=settings.CACHE_WARMUP_BUDGET,
+            help='Бюджет времени в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        paths = warmup.hot_paths(
+            options['index_pages'], options['groups'], options['authors']
+        )
+        # Django уже настроен командой: get_wsgi_application
+        # повторил бы django.setup() и настройку логирования
+        results = warmup.warm(
+            WSGIHandler(),
+            paths,
+            options['workers'],
+            options['budget']
+        )
+        for path in paths:
+            if path in results:
+                status, cache_result = results[path]
+                self.stdout.write(f'{path} {status} {cache_result or "-"}')
+            else:
+                self.stdout.write(f'{path} пропущена')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето страниц: {len(results)} из {len(paths)}'
+        ))
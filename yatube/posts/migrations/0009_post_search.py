@@ -0,0 +1,33 @@
+# Generated by Django 2.2.19 on 2026-10-18 03:10
+
+from django.db import migrations
+
+
+def fill_search_index(apps, schema_editor):
+    from posts.search import index_text
+
+    Post = apps.get_model('posts', 'Post')
+    schema_editor.connection.cursor().executemany(
+        'INSERT INTO posts_post_search (rowid, text) VALUES (%s, %s)',
+        [
+            (post_id, index_text(text))
+            for post_id, text in Post.objects.values_list('pk', 'text')
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_updated'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+            "text, tokenize = 'unicode61', prefix = '2 3')",
+            'DROP TABLE posts_post_search',
+            hints={'model_name': 'post'},
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.19 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_comment_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usercounter',
+            name='feed_backfill_pending',
+            field=models.BooleanField(default=False, verbose_name='Ленты подписчиков ждут дополнения'),
+        ),
+    ]
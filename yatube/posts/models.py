@@ -2,11 +2,26 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from yatube.settings import TRIM_STRING_LENGTH
 from core.models import CreatedModel
+from .sharding import ShardedQuerySet, allocate_post_id, enabled
 
 
 User = get_user_model()
 
 
+def save_without_counters(instance, counter_fields, kwargs):
+    """
+    Параметры save(), при которых уже сохраненная строка
+    не перезаписывает счетчики, обновляемые сигналами через F().
+    """
+    if instance._state.adding or kwargs.get('update_fields') is not None:
+        return kwargs
+    kwargs['update_fields'] = [
+        field.name for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in counter_fields
+    ]
+    return kwargs
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Заголовок')
     slug = models.SlugField(
@@ -14,15 +29,65 @@ class Group(models.Model):
         unique=True
     )
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        super().save(
+            *args, **save_without_counters(self, ('posts_count',), kwargs)
+        )
+
     class Meta:
         verbose_name = 'Группа'
         verbose_name_plural = 'Группы'
 
 
+class PostQuerySet(ShardedQuerySet):
+    """
+    Выборки постов под конкретные шаблоны без запросов N+1.
+    В шардах нет пользователей и групп, поэтому при шардировании
+    они догружаются отдельными запросами к основной базе.
+    """
+
+    # Поля, которые нужны карточке includes/post.html и ключу ее кэша
+    CARD_FIELDS = (
+        'text', 'created', 'updated', 'image', 'comments_count',
+        'author', 'author__username', 'author__first_name',
+        'author__last_name', 'group', 'group__slug',
+    )
+
+    def for_cards(self):
+        """Посты для лент: автор и группа одним запросом с постами."""
+        if enabled():
+            return self.prefetch_related('author', 'group').only(*(
+                field for field in self.CARD_FIELDS if '__' not in field
+            ))
+        return self.select_related('author', 'group').only(
+            *self.CARD_FIELDS
+        )
+
+    def for_detail(self):
+        """
+        Пост для post_detail со счетчиками автора.
+        Комментарии читаются порциями, см. utils.comment_chunk.
+        """
+        if enabled():
+            return self.prefetch_related(
+                models.Prefetch(
+                    'author',
+                    queryset=User.objects.select_related('counters')
+                ),
+                'group'
+            )
+        return self.select_related('author__counters', 'group')
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст',
@@ -50,16 +115,57 @@ class Post(CreatedModel):
         blank=True,
         null=True
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False
+    )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:TRIM_STRING_LENGTH]
 
+    def save(self, *args, **kwargs):
+        if self.pk is None and enabled():
+            self.pk = allocate_post_id(self.author_id)
+            kwargs['force_insert'] = True
+        super().save(
+            *args, **save_without_counters(self, ('comments_count',), kwargs)
+        )
+
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created_id_idx'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created_id_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
 
+class CommentQuerySet(ShardedQuerySet):
+    def with_authors(self):
+        """Комментарии с авторами без запросов N+1."""
+        if enabled():
+            return self.prefetch_related('author')
+        return self.select_related('author')
+
+
 class Comment(CreatedModel):
     post = models.ForeignKey(
         Post,
@@ -80,13 +186,38 @@ class Comment(CreatedModel):
         help_text='Текст нового комментария'
     )
 
+    objects = CommentQuerySet.as_manager()
+
     def __str__(self):
         return self.text
 
     class Meta:
-        ordering = ['created']
+        ordering = ['created', 'id']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_id_idx'
+            ),
+        ]
+
+
+class PostKey(models.Model):
+    """
+    Глобальный id поста при шардировании (posts.sharding)
+    и автор, по которому находится шард поста.
+    """
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = 'Ключ поста'
+        verbose_name_plural = 'Ключи постов'
 
 
 class Follow(CreatedModel):
@@ -113,3 +244,80 @@ class Follow(CreatedModel):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class UserCounter(models.Model):
+    """Денормализованные счетчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        verbose_name='Пользователь',
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='counters'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Количество подписок',
+        default=0
+    )
+    # Автор перестал быть популярным, но ленты его подписчиков
+    # еще не дополнены: пока флаг стоит, посты подмешиваются при чтении
+    feed_backfill_pending = models.BooleanField(
+        verbose_name='Ленты подписчиков ждут дополнения',
+        default=False
+    )
+
+    def __str__(self):
+        return str(self.user)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+
+class FeedEntry(models.Model):
+    """
+    Запись материализованной ленты подписок:
+    пост автора, на которого подписан пользователь.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        verbose_name='Пост',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    created = models.DateTimeField(verbose_name='Дата создания поста')
+
+    class Meta:
+        ordering = ['-created', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='feed_user_created_post_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
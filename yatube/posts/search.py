@@ -0,0 +1,200 @@
+"""
+Полнотекстовый поиск по постам на SQLite FTS5.
+В виртуальной таблице posts_post_search хранятся основы слов
+текста поста (rowid = id поста), поэтому запрос 'важная новость'
+находит и 'важные новости'. Индекс обновляется сигналами.
+Запрос поддерживает фразы в кавычках и префиксы со звездочкой:
+"первый пост" прог*
+"""
+import base64
+import binascii
+import math
+import re
+
+from django.conf import settings
+from django.db import NotSupportedError, connections, router
+from django.db.models.expressions import RawSQL
+
+from . import sharding
+from .models import Post
+from .stemmer import stem
+from .utils import CURSOR_SEPARATOR, CursorPaginator
+
+
+TABLE = 'posts_post_search'
+
+WORD_RE = re.compile(r'[^\W_]+')
+
+# Фраза в кавычках или отдельное слово, возможно со звездочкой
+TERM_RE = re.compile(r'"([^"]*)"?|([^\W_]+)(\*?)')
+
+INDEX_CHUNK_SIZE = 500
+
+
+def index_text(text):
+    """Текст для индекса: основы слов через пробел."""
+    return ' '.join(stem(word) for word in WORD_RE.findall(text))
+
+
+def build_query(query):
+    """
+    Переводит пользовательский запрос в выражение MATCH.
+    Все слова обязательны; слова и фразы берутся в кавычки,
+    поэтому синтаксис FTS5 в запросе не срабатывает.
+    Пустая строка — в запросе нет слов.
+    """
+    terms = []
+    for phrase, word, prefix in TERM_RE.findall(query):
+        if word:
+            terms.append(f'"{stem(word)}"' + (' *' if prefix else ''))
+            continue
+        words = index_text(phrase)
+        if words:
+            terms.append(f'"{words}"')
+    return ' '.join(terms)
+
+
+def insert_rows(cursor, rows):
+    cursor.executemany(
+        f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)', rows
+    )
+
+
+def write_connection(post=None):
+    """Соединение с базой, в которую пишутся посты (и индекс поста)."""
+    return connections[router.db_for_write(Post, instance=post)]
+
+
+def read_connection():
+    """Соединение с базой, из которой читаются посты."""
+    return connections[router.db_for_read(Post)]
+
+
+def read_connections():
+    """
+    Соединения со всеми базами индекса: с шардами индекс каждого
+    шарда хранит только его посты.
+    """
+    if sharding.enabled():
+        return [connections[shard] for shard in settings.POST_SHARDS]
+    return [read_connection()]
+
+
+def index_post(post):
+    with write_connection(post).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        insert_rows(cursor, [(post.pk, index_text(post.text))])
+
+
+def unindex_post(post):
+    with write_connection(post).cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+
+
+def rebuild():
+    """
+    Заново строит индекс по всем постам. Возвращает их количество.
+    С шардами не выполняется: индекс каждого шарда — в нем самом.
+    """
+    if sharding.enabled():
+        raise NotSupportedError('Перестройка индекса не работает с шардами')
+    total = 0
+    posts = Post.objects.order_by().values_list('pk', 'text')
+    with write_connection().cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        rows = []
+        for post_id, text in posts.iterator(chunk_size=INDEX_CHUNK_SIZE):
+            rows.append((post_id, index_text(text)))
+            if len(rows) == INDEX_CHUNK_SIZE:
+                insert_rows(cursor, rows)
+                total += len(rows)
+                rows = []
+        insert_rows(cursor, rows)
+        total += len(rows)
+        # Сливает сегменты индекса после массовой вставки
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return total
+
+
+def filter_queryset(queryset, query):
+    """Посты queryset, подходящие под запрос (порядок не меняется)."""
+    match = build_query(query)
+    if not match:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', (match,)
+    ))
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Результаты поиска по релевантности (bm25) с паджинацией
+    по ключу (релевантность, id): каждая страница — один запрос
+    к индексу с условием на ключ, без OFFSET.
+    С шардами запрос выполняется в индексе каждого шарда, а строки
+    сливаются по тому же ключу; bm25 считается по статистике
+    своего шарда.
+    """
+
+    def __init__(self, object_list, per_page, query):
+        super().__init__(object_list, per_page)
+        self.match = build_query(query)
+
+    def key(self, obj):
+        return obj.search_rank, obj.pk
+
+    def encode(self, values):
+        rank, pk = values
+        raw = f'{rank!r}{CURSOR_SEPARATOR}{pk}'
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode(self, token):
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            rank, pk = raw.decode().split(CURSOR_SEPARATOR)
+            rank, pk = float(rank), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        if not math.isfinite(rank):
+            return None
+        return rank, pk
+
+    def fetch(self, position, backwards, limit):
+        if not self.match:
+            return []
+        # bm25 меньше у более релевантных постов
+        order, lookup = ('DESC', '<') if backwards else ('ASC', '>')
+        params = [self.match]
+        seek = ''
+        if position is not None:
+            rank, pk = position
+            seek = (
+                f'WHERE score {lookup} %s '
+                f'OR (score = %s AND post_id {lookup} %s)'
+            )
+            params += [rank, rank, pk]
+        ranks = []
+        for connection in read_connections():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT post_id, score FROM ('
+                    f'SELECT rowid AS post_id, bm25({TABLE}) AS score '
+                    f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+                    f') {seek} '
+                    f'ORDER BY score {order}, post_id {order} LIMIT %s',
+                    [*params, limit]
+                )
+                ranks.extend(cursor.fetchall())
+        ranks = sorted(
+            ranks, key=lambda row: (row[1], row[0]), reverse=backwards
+        )[:limit]
+        posts = self.object_list.in_bulk([post_id for post_id, _ in ranks])
+        found = []
+        for post_id, rank in ranks:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = rank
+                found.append(post)
+        return found
@@ -0,0 +1,308 @@
+"""
+Шардирование постов и комментариев по автору.
+Посты автора и комментарии к ним хранятся в шарде
+POST_SHARDS[author_id % len(POST_SHARDS)], а пользователи, группы,
+подписки и счетчики — в основной базе. id постов выдает таблица
+PostKey основной базы: они уникальны во всех шардах, и по id
+находится автор, а по нему — шард.
+Выборки ShardedQuerySet без явного using() выполняются во всех
+подходящих шардах, результаты сливаются в порядке сортировки выборки.
+Без POST_SHARDS все данные лежат в основной базе, как раньше.
+"""
+import functools
+import heapq
+import itertools
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import NotSupportedError, models
+from django.db.models.query import ModelIterable
+
+
+SHARDED_MODELS = ('posts.Post', 'posts.Comment')
+
+# Агрегаты, которые можно собрать из значений по шардам
+COMBINE = {
+    'Min': min,
+    'Max': max,
+    'Sum': sum,
+    'Count': sum,
+}
+
+
+def enabled():
+    return bool(settings.POST_SHARDS)
+
+
+def is_sharded(model):
+    return enabled() and model._meta.label in SHARDED_MODELS
+
+
+def shard_for(author_id):
+    """Шард постов автора."""
+    shards = settings.POST_SHARDS
+    return shards[author_id % len(shards)]
+
+
+def allocate_post_id(author_id):
+    """Выдает глобальный id новому посту автора."""
+    PostKey = apps.get_model('posts', 'PostKey')
+    return PostKey.objects.create(author_id=author_id).pk
+
+
+def shard_of_post(post_id):
+    """Шард поста по id или None для неизвестного поста."""
+    PostKey = apps.get_model('posts', 'PostKey')
+    author_id = PostKey.objects.filter(
+        pk=post_id
+    ).values_list('author_id', flat=True).first()
+    return None if author_id is None else shard_for(author_id)
+
+
+def shard_from_hints(model, hints):
+    """
+    Шард для модели по подсказкам роутера или None, если по ним
+    шард не определить: посты автора — в его шарде, комментарии
+    поста — в шарде поста.
+    """
+    instance = hints.get('instance')
+    if instance is None:
+        return None
+    if (
+        instance._meta.label in SHARDED_MODELS
+        and instance._state.db in settings.POST_SHARDS
+    ):
+        return instance._state.db
+    if model._meta.label == 'posts.Post' and isinstance(
+        instance, apps.get_model(settings.AUTH_USER_MODEL)
+    ):
+        return shard_for(instance.pk)
+    return None
+
+
+def ordering_key(model, ordering):
+    """
+    Ключ сравнения объектов по полям сортировки выборки.
+    Сливать можно только по собственным полям модели.
+    """
+    fields = []
+    for name in ordering:
+        if not isinstance(name, str) or '__' in name or name == '?':
+            raise NotSupportedError(
+                f'Сортировку {name!r} нельзя слить из шардов'
+            )
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        if name != 'pk':
+            name = model._meta.get_field(name).attname
+        fields.append((name, descending))
+
+    def compare(first, second):
+        for name, descending in fields:
+            # NULL меньше любых значений, как в SQLite
+            left, right = getattr(first, name), getattr(second, name)
+            left = (left is not None, left)
+            right = (right is not None, right)
+            if left != right:
+                result = 1 if left > right else -1
+                return -result if descending else result
+        return 0
+
+    return functools.cmp_to_key(compare)
+
+
+class ShardedQuerySet(models.QuerySet):
+    """
+    QuerySet, который при включенном шардировании и без using()
+    читает и меняет строки во всех шардах выборки.
+    Объекты моделей сливаются по сортировке выборки; строки values()
+    и values_list() сливать не по чему, поэтому они склеиваются
+    по шардам, а срез по сортировке для них не поддерживается.
+    """
+
+    def shards(self):
+        """Шарды выборки или None, если она читает одну базу."""
+        if self._db is not None or not is_sharded(self.model):
+            return None
+        shard = shard_from_hints(self.model, self._hints)
+        return [shard] if shard else list(settings.POST_SHARDS)
+
+    def on_shard(self, shard, high_mark=None):
+        clone = self.using(shard)
+        clone._prefetch_related_lookups = ()
+        clone.query.clear_limits()
+        clone.query.set_limits(high=high_mark)
+        return clone
+
+    def ordering(self):
+        query = self.query
+        ordering = (
+            query.order_by
+            or (query.default_ordering and self.model._meta.ordering)
+            or ()
+        )
+        if not query.standard_ordering:
+            ordering = [
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            ]
+        return ordering
+
+    def gather(self, shards, chunk_size=None):
+        """
+        Строки выборки из всех шардов в порядке ее сортировки.
+        С chunk_size шарды читаются порциями через iterator().
+        """
+        low, high = self.query.low_mark, self.query.high_mark
+        parts = [self.on_shard(shard, high) for shard in shards]
+        if chunk_size:
+            parts = [part.iterator(chunk_size) for part in parts]
+        ordering = self.ordering() if self.ordered else ()
+        if not ordering or len(parts) == 1:
+            rows = itertools.chain.from_iterable(parts)
+        elif issubclass(self._iterable_class, ModelIterable):
+            rows = heapq.merge(
+                *parts, key=ordering_key(self.model, ordering)
+            )
+        elif self.query.is_sliced:
+            raise NotSupportedError(
+                'Срез values() по сортировке нельзя слить из шардов'
+            )
+        else:
+            rows = itertools.chain.from_iterable(parts)
+        return itertools.islice(rows, low, high)
+
+    def prefetch_by_shard(self):
+        """Связанные объекты догружаются отдельно для каждого шарда."""
+        by_shard = defaultdict(list)
+        for obj in self._result_cache:
+            by_shard[obj._state.db].append(obj)
+        for objects in by_shard.values():
+            models.prefetch_related_objects(
+                objects, *self._prefetch_related_lookups
+            )
+        self._prefetch_done = True
+
+    def _fetch_all(self):
+        shards = self._result_cache is None and self.shards()
+        if shards:
+            self._result_cache = list(self.gather(shards))
+            if self._prefetch_related_lookups and not self._prefetch_done:
+                self.prefetch_by_shard()
+        super()._fetch_all()
+
+    def iterator(self, chunk_size=2000):
+        shards = self.shards()
+        if not shards:
+            return super().iterator(chunk_size)
+        return self.gather(shards, chunk_size)
+
+    def count(self):
+        shards = self._result_cache is None and self.shards()
+        if not shards:
+            return super().count()
+        low, high = self.query.low_mark, self.query.high_mark
+        total = sum(
+            self.on_shard(shard, high).count() for shard in shards
+        )
+        if high is not None:
+            total = min(total, high)
+        return max(total - low, 0)
+
+    def exists(self):
+        shards = self._result_cache is None and self.shards()
+        if not shards:
+            return super().exists()
+        return any(self.on_shard(shard).exists() for shard in shards)
+
+    def aggregate(self, *args, **kwargs):
+        shards = self.shards()
+        if not shards:
+            return super().aggregate(*args, **kwargs)
+        for arg in args:
+            kwargs[arg.default_alias] = arg
+        for alias, aggregate in kwargs.items():
+            if (
+                getattr(aggregate, 'name', None) not in COMBINE
+                or getattr(aggregate, 'distinct', False)
+            ):
+                raise NotSupportedError(
+                    f'Агрегат {alias!r} нельзя собрать из шардов'
+                )
+        results = [
+            self.on_shard(shard).aggregate(**kwargs) for shard in shards
+        ]
+        combined = {}
+        for alias, aggregate in kwargs.items():
+            values = [
+                result[alias] for result in results
+                if result[alias] is not None
+            ]
+            combined[alias] = (
+                COMBINE[aggregate.name](values) if values else None
+            )
+        return combined
+
+    def update(self, **kwargs):
+        shards = self.shards()
+        if not shards:
+            return super().update(**kwargs)
+        return sum(
+            self.on_shard(shard).update(**kwargs) for shard in shards
+        )
+
+    def delete(self):
+        shards = self.shards()
+        if not shards:
+            return super().delete()
+        total, by_model = 0, defaultdict(int)
+        for shard in shards:
+            deleted, counts = self.on_shard(shard).delete()
+            total += deleted
+            for label, count in counts.items():
+                by_model[label] += count
+        return total, dict(by_model)
+
+    def create(self, **kwargs):
+        if not self.shards():
+            return super().create(**kwargs)
+        # Шард для записи выбирает роутер по самому объекту
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True)
+        return obj
+
+
+class ShardRouter:
+    """
+    Роутер шардов: записи постов и комментариев идут в шард автора
+    поста, чтения — в шард, если он понятен из подсказок.
+    Остальные модели решает следующий роутер.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded(model):
+            return None
+        return shard_from_hints(model, hints)
+
+    def db_for_write(self, model, **hints):
+        if not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        if isinstance(instance, model):
+            if model._meta.label == 'posts.Post':
+                return shard_for(instance.author_id)
+            post_field = model._meta.get_field('post')
+            if post_field.is_cached(instance):
+                return shard_for(instance.post.author_id)
+            return shard_of_post(instance.post_id)
+        return shard_from_hints(model, hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        В шардах — только таблицы приложения posts, без миграций
+        данных: они читают пользователей из основной базы.
+        """
+        if db in settings.SHARD_DATABASES:
+            return app_label == 'posts' and model_name is not None
+        return None
@@ -0,0 +1,213 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.db import atomic_write
+
+from . import caching, counters, counts, feeds, search
+from .models import Comment, Follow, Group, Post, User, UserCounter
+
+
+# Сохранение пользователя при входе не меняет ничего на страницах
+LOGIN_UPDATE_FIELDS = frozenset({'last_login'})
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, using, **kwargs):
+    """Запоминает группу поста до сохранения, чтобы заметить перенос."""
+    instance._previous_group_id = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._previous_group_id = Post.objects.using(using).filter(
+            pk=instance.pk
+        ).values_list('group_id', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def update_counts_on_post_save(sender, instance, created, **kwargs):
+    if created:
+        counts.change_count([counts.scope_all()], 1)
+
+
+@receiver(post_delete, sender=Post)
+def update_counts_on_post_delete(sender, instance, **kwargs):
+    counts.change_count([counts.scope_all()], -1)
+
+
+@receiver(post_save, sender=User)
+def create_user_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserCounter.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_post_save(sender, instance, created, **kwargs):
+    with atomic_write():
+        if created:
+            counters.shift_user(instance.author_id, 'posts_count', 1)
+            counters.shift_group(instance.group_id, 1)
+            return
+        previous_group_id = getattr(instance, '_previous_group_id', None)
+        if previous_group_id != instance.group_id:
+            counters.shift_group(previous_group_id, -1)
+            counters.shift_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_post_delete(sender, instance, **kwargs):
+    with atomic_write():
+        counters.shift_user(instance.author_id, 'posts_count', -1)
+        counters.shift_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def update_counters_on_comment_save(sender, instance, created, **kwargs):
+    if not created:
+        return
+    with atomic_write():
+        counters.shift_user(instance.author_id, 'comments_count', 1)
+        counters.shift_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_counters_on_comment_delete(sender, instance, **kwargs):
+    with atomic_write():
+        counters.shift_user(instance.author_id, 'comments_count', -1)
+        counters.shift_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def update_counters_on_follow_save(sender, instance, created, **kwargs):
+    if not created:
+        return
+    with atomic_write():
+        counters.shift_user(instance.author_id, 'followers_count', 1)
+        counters.shift_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def update_counters_on_follow_delete(sender, instance, **kwargs):
+    with atomic_write():
+        counters.shift_user(instance.author_id, 'followers_count', -1)
+        counters.shift_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_feed_on_unfollow(sender, instance, **kwargs):
+    feeds.lose_follower(instance.user_id, instance.author_id)
+
+
+def invalidate_post_pages(post, group_ids=(), extra_scopes=()):
+    """Обновляет версии страниц, на которых показан пост."""
+    slugs = Group.objects.filter(
+        pk__in=[group_id for group_id in group_ids if group_id]
+    ).values_list('slug', flat=True)
+    caching.bump_versions([
+        caching.scope_all(),
+        caching.scope_author(post.author.username),
+        caching.scope_post(post.pk),
+        *map(caching.scope_group, slugs),
+        *extra_scopes,
+    ])
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._previous_slug = Group.objects.filter(
+        pk=instance.pk
+    ).values_list('slug', flat=True).first()
+
+
+@receiver(pre_save, sender=User)
+def remember_username(sender, instance, update_fields=None, **kwargs):
+    if update_fields == LOGIN_UPDATE_FIELDS:
+        return
+    instance._previous_username = User.objects.filter(
+        pk=instance.pk
+    ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def invalidate_pages_on_post_save(sender, instance, created, **kwargs):
+    if created:
+        caching.remember_post_author(instance)
+    # Новый пост меняет счетчик постов на страницах других постов автора
+    invalidate_post_pages(
+        instance,
+        (instance.group_id, getattr(instance, '_previous_group_id', None)),
+        [caching.scope_author_posts(instance.author_id)] if created else ()
+    )
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_pages_on_post_delete(sender, instance, **kwargs):
+    invalidate_post_pages(
+        instance,
+        (instance.group_id,),
+        [caching.scope_author_posts(instance.author_id)]
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_pages_on_comment_change(sender, instance, using, **kwargs):
+    post = Post.objects.using(using).filter(pk=instance.post_id).first()
+    if post is not None:
+        invalidate_post_pages(post, (post.group_id,))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_pages_on_group_change(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, '_previous_slug', None)}
+    caching.bump_versions([
+        caching.scope_all(),
+        caching.scope_groups(),
+        *map(caching.scope_group, filter(None, slugs)),
+    ])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_pages_on_user_change(sender, instance, **kwargs):
+    if (
+        kwargs.get('created')
+        or kwargs.get('update_fields') == LOGIN_UPDATE_FIELDS
+    ):
+        return
+    usernames = {
+        instance.username,
+        getattr(instance, '_previous_username', None)
+    }
+    caching.bump_versions([
+        caching.scope_all(),
+        caching.scope_users(),
+        *map(caching.scope_author, filter(None, usernames)),
+    ])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_pages_on_follow_change(sender, instance, **kwargs):
+    caching.bump_versions([caching.scope_author(instance.author.username)])
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    search.unindex_post(instance)
@@ -0,0 +1,143 @@
+"""
+Стеммер Портера (Snowball) для русского языка.
+Приводит слова к основе, чтобы поиск находил разные формы слова:
+'важная', 'важного' и 'важнее' дают основу 'важн'.
+Алгоритм: https://snowballstem.org/algorithms/russian/stemmer.html
+"""
+VOWELS = frozenset('аеиоуыэюя')
+
+# Окончания первой группы допустимы только после 'а' или 'я'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+
+ADJECTIVE = (
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой',
+        'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых',
+        'ую', 'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+
+REFLEXIVE = ((), ('ся', 'сь'))
+
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+
+NOUN = (
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи',
+        'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием',
+        'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию',
+        'ью', 'ю', 'ия', 'ья', 'я',
+    ),
+)
+
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+TIDY_UP = (('ейш', 'ейше'), ('н',), ('ь',))
+
+
+def region_after_vowel_pair(word, start):
+    """Начало области после первой пары 'гласная, согласная'."""
+    for index in range(max(start, 1), len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def longest_ending(word, limit, endings):
+    """Самое длинное окончание из endings, целиком лежащее после limit."""
+    found = ''
+    for ending in endings:
+        if (
+            len(ending) > len(found)
+            and word.endswith(ending)
+            and len(word) - len(ending) >= limit
+        ):
+            found = ending
+    return found
+
+
+def remove_ending(word, limit, groups):
+    """
+    Отрезает самое длинное окончание из групп (после а/я, обычные).
+    Возвращает новое слово или None, если окончание не найдено.
+    """
+    after_a, plain = groups
+    ending = longest_ending(word, limit, (*after_a, *plain))
+    if not ending:
+        return None
+    stem = word[:-len(ending)]
+    if ending in plain:
+        return stem
+    if len(stem) > limit and stem[-1] in 'ая':
+        return stem
+    return None
+
+
+def stem(word):
+    """Основа слова; слова без русских гласных возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        None
+    )
+    if rv is None:
+        return word
+    r2 = region_after_vowel_pair(
+        word, region_after_vowel_pair(word, 0) + 1
+    )
+
+    # Шаг 1: деепричастие или (возвратность +) прилагательное,
+    # глагол, существительное
+    result = remove_ending(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = remove_ending(word, rv, REFLEXIVE) or word
+        result = remove_ending(word, rv, ADJECTIVE)
+        if result is not None:
+            result = remove_ending(result, rv, PARTICIPLE) or result
+        else:
+            result = (
+                remove_ending(word, rv, VERB)
+                or remove_ending(word, rv, NOUN)
+            )
+    word = result or word
+
+    # Шаг 2
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательное окончание в R2
+    word = remove_ending(word, max(rv, r2), DERIVATIONAL) or word
+
+    # Шаг 4: превосходная степень, удвоенная 'н', мягкий знак
+    superlative, double_n, soft_sign = TIDY_UP
+    ending = longest_ending(word, rv, (*superlative, *double_n, *soft_sign))
+    if ending in superlative:
+        word = word[:-len(ending)]
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+    elif ending in double_n:
+        if word.endswith('нн') and len(word) - 2 >= rv:
+            word = word[:-1]
+    elif ending in soft_sign:
+        word = word[:-1]
+    return word
@@ -0,0 +1,46 @@
+import logging
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts import thumbnails
+from posts.caching import render_post_cards
+from posts.utils import elided_page_range
+
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts, bool_flag=False, group=None):
+    """Карточки постов страницы из кэша фрагментов."""
+    return render_post_cards(posts, bool_flag=bool_flag, group=group)
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(image, lazy=True):
+    """
+    Картинка поста в нескольких ширинах и форматах.
+    Как и {% thumbnail %}, при ошибке обработки ничего не выводит.
+    """
+    try:
+        picture = thumbnails.picture(image)
+    except Exception:
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Не удалось подготовить картинку %s', image)
+        picture = None
+    return {
+        'picture': picture,
+        'sizes': settings.POST_IMAGE_SIZES,
+        'lazy': lazy,
+    }
+
+
+@register.simple_tag
+def page_numbers(page_obj):
+    """Номера страниц паджинатора с пропусками (None)."""
+    return list(elided_page_range(page_obj))
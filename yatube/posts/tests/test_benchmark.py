@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from core.tests.utils import TestCase
+from io import StringIO
+from posts.management.commands.loadtest import parse_mix
+from posts.models import Comment, FeedEntry, Follow, Group, Post, UserCounter
+
+
+User = get_user_model()
+
+
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+        call_command(
+            'seed_data',
+            users=20,
+            groups=2,
+            posts=60,
+            comments=30,
+            follows=100,
+            batch_size=7,
+            stdout=StringIO()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+
+    def test_seed_data_creates_consistent_dataset(self):
+        """seed_data создает данные и пересчитывает производные."""
+        counts = (
+            (User, 20),
+            (Group, 2),
+            (Post, 60),
+            (Comment, 30),
+        )
+        for model, count in counts:
+            with self.subTest(model=model.__name__):
+                self.assertEqual(model.objects.count(), count)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(FeedEntry.objects.exists())
+        author = UserCounter.objects.order_by('-posts_count').first()
+        self.assertEqual(
+            author.posts_count,
+            Post.objects.filter(author_id=author.user_id).count()
+        )
+
+    def test_benchmark_views_compares_with_baseline(self):
+        """benchmark_views сохраняет замеры и находит регрессии."""
+        path = os.path.join(
+            BenchmarkCommandsTests.temp_dir, 'baseline.json'
+        )
+        call_command(
+            'benchmark_views',
+            requests=2,
+            pages=[1, 2],
+            save_baseline=path,
+            stdout=StringIO()
+        )
+        with open(path) as file:
+            baseline = json.load(file)
+        self.assertIn('posts:index?page=2', baseline)
+        self.assertIn('posts:post_detail', baseline)
+        call_command(
+            'benchmark_views',
+            requests=2,
+            baseline=path,
+            tolerance=1000,
+            stdout=StringIO()
+        )
+        for result in baseline.values():
+            result['queries'] = 0
+        with open(path, 'w') as file:
+            json.dump(baseline, file)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_views',
+                requests=2,
+                baseline=path,
+                stdout=StringIO(),
+                stderr=StringIO()
+            )
+
+
+class LoadtestMixTests(TestCase):
+    def test_parse_mix(self):
+        """Смесь сценариев loadtest разбирается и проверяется."""
+        self.assertEqual(
+            parse_mix('anon=80, feed=15,post=5'),
+            {'anon': 80, 'feed': 15, 'post': 5}
+        )
+        for value in ('anon=1,unknown=1', 'anon=x', 'anon=0'):
+            with self.subTest(value=value):
+                with self.assertRaises(CommandError):
+                    parse_mix(value)
@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from core.tests.utils import TestCase
+from io import StringIO
+from posts.models import Post, Group, Comment, Follow, UserCounter
+
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+
+    def counters(self, user):
+        return UserCounter.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счетчики обновляются при создании и удалении объектов."""
+        post = Post.objects.create(
+            text='Тестовый пост',
+            author=CountersTests.author,
+            group=CountersTests.group
+        )
+        Comment.objects.create(
+            post=post,
+            author=CountersTests.reader,
+            text='Комментарий'
+        )
+        Follow.objects.create(
+            user=CountersTests.reader,
+            author=CountersTests.author
+        )
+        post.refresh_from_db()
+        CountersTests.group.refresh_from_db()
+        author_counters = self.counters(CountersTests.author)
+        reader_counters = self.counters(CountersTests.reader)
+        values = (
+            (post.comments_count, 1),
+            (CountersTests.group.posts_count, 1),
+            (author_counters.posts_count, 1),
+            (author_counters.followers_count, 1),
+            (reader_counters.comments_count, 1),
+            (reader_counters.following_count, 1),
+        )
+        for value, expected in values:
+            with self.subTest(value=value):
+                self.assertEqual(value, expected)
+        post.delete()
+        Follow.objects.all().delete()
+        CountersTests.group.refresh_from_db()
+        author_counters = self.counters(CountersTests.author)
+        reader_counters = self.counters(CountersTests.reader)
+        values = (
+            (CountersTests.group.posts_count, 0),
+            (author_counters.posts_count, 0),
+            (author_counters.followers_count, 0),
+            (reader_counters.comments_count, 0),
+            (reader_counters.following_count, 0),
+        )
+        for value, expected in values:
+            with self.subTest(value=value):
+                self.assertEqual(value, expected)
+
+    def test_edit_does_not_overwrite_counter(self):
+        """Сохранение поста не затирает счетчик комментариев."""
+        post = Post.objects.create(
+            text='Тестовый пост',
+            author=CountersTests.author
+        )
+        Comment.objects.create(
+            post=post,
+            author=CountersTests.reader,
+            text='Комментарий'
+        )
+        post.text = 'Измененный пост'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет расхождения счетчиков."""
+        Post.objects.bulk_create([
+            Post(
+                text='Тестовый пост',
+                author=CountersTests.author,
+                group=CountersTests.group
+            ) for _ in range(3)
+        ])
+        UserCounter.objects.filter(user=CountersTests.reader).delete()
+        call_command('recount', stdout=StringIO())
+        CountersTests.group.refresh_from_db()
+        self.assertEqual(CountersTests.group.posts_count, 3)
+        self.assertEqual(self.counters(CountersTests.author).posts_count, 3)
+        self.assertEqual(self.counters(CountersTests.reader).posts_count, 0)
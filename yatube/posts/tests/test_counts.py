@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from core.tests.utils import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts import counts
+from posts.models import Post, Group, Follow
+from posts.utils import CachedCountPaginator
+
+
+User = get_user_model()
+
+
+class PostCountCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(
+            user=PostCountCacheTests.follower,
+            author=PostCountCacheTests.user
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=PostCountCacheTests.user,
+            group=PostCountCacheTests.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def feed_scope(self):
+        return counts.scope_feed(
+            PostCountCacheTests.follower.pk, [PostCountCacheTests.user.pk]
+        )
+
+    def test_count_is_cached(self):
+        """Повторная страница не выполняет COUNT(*)."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_group_and_author_use_counters(self):
+        """Группа и профиль берут количество из денормализованных счетчиков."""
+        urls = (
+            reverse(
+                'posts:group_list', args=(PostCountCacheTests.group.slug,)
+            ),
+            reverse('posts:profile', args=(PostCountCacheTests.user,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+                for query in queries.captured_queries:
+                    self.assertNotIn('COUNT(', query['sql'])
+
+    def test_count_follows_create_and_delete(self):
+        """Счетчик всех постов обновляется при создании и удалении поста."""
+        self.assertEqual(counts.get_count(counts.scope_all(), Post.objects), 1)
+        post = Post.objects.create(
+            text='Новый пост',
+            author=PostCountCacheTests.user,
+            group=PostCountCacheTests.group
+        )
+        self.assertEqual(counts.get_count(counts.scope_all(), Post.objects), 2)
+        post.delete()
+        self.assertEqual(counts.get_count(counts.scope_all(), Post.objects), 1)
+
+    def test_feed_count_key_changes(self):
+        """Новый пост автора из подписок дает новый ключ счетчика ленты."""
+        scope = self.feed_scope()
+        self.assertEqual(scope, self.feed_scope())
+        Post.objects.create(text='Новый пост', author=PostCountCacheTests.user)
+        self.assertNotEqual(scope, self.feed_scope())
+
+    @override_settings(POSTS_COUNT_APPROXIMATE_THRESHOLD=2)
+    def test_approximate_count(self):
+        """После порога количество считается приблизительно."""
+        Post.objects.bulk_create([
+            Post(text='Пост', author=PostCountCacheTests.user)
+            for _ in range(4)
+        ])
+        self.assertEqual(counts.count_queryset(Post.objects.all()), 5)
+        self.assertEqual(
+            counts.count_queryset(PostCountCacheTests.user.posts.all()),
+            3
+        )
+
+    @override_settings(POSTS_COUNT_APPROXIMATE_THRESHOLD=2)
+    def test_approximate_count_does_not_clamp_pages(self):
+        """При приблизительном количестве дальние страницы доступны."""
+        Post.objects.bulk_create([
+            Post(text=f'Пост {number}', author=PostCountCacheTests.user)
+            for number in range(4)
+        ])
+        paginator = CachedCountPaginator(
+            PostCountCacheTests.user.posts.all(), 1, self.feed_scope()
+        )
+        self.assertEqual(paginator.num_pages, 3)
+        page = paginator.get_page(4)
+        self.assertEqual(page.number, 4)
+        self.assertTrue(page.has_next())
+        last = paginator.get_page(5)
+        self.assertEqual(last.number, 5)
+        self.assertFalse(last.has_next())
+        self.assertEqual(paginator.get_page(9).number, 3)
@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from core.tests.utils import TestCase
+from django.urls import reverse
+from io import StringIO
+from posts.models import Post, Follow, FeedEntry, UserCounter
+
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Bloger')
+        cls.follower = User.objects.create_user(username='Follower')
+
+    def setUp(self):
+        Follow.objects.create(
+            user=FeedTests.follower,
+            author=FeedTests.author
+        )
+
+    def feed(self):
+        return list(
+            FeedEntry.objects.filter(
+                user=FeedTests.follower
+            ).values_list('post_id', flat=True)
+        )
+
+    def test_new_post_is_fanned_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        post = Post.objects.create(text='Пост', author=FeedTests.author)
+        self.assertEqual(self.feed(), [post.pk])
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        """Подписка добавляет старые посты, отписка убирает их."""
+        Follow.objects.all().delete()
+        post = Post.objects.create(text='Пост', author=FeedTests.author)
+        self.assertEqual(self.feed(), [])
+        Follow.objects.create(
+            user=FeedTests.follower,
+            author=FeedTests.author
+        )
+        self.assertEqual(self.feed(), [post.pk])
+        Follow.objects.all().delete()
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(FEED_MAX_ENTRIES=3)
+    def test_feed_is_trimmed(self):
+        """В ленте хранится не больше FEED_MAX_ENTRIES записей."""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=FeedTests.author)
+            for number in range(5)
+        ]
+        expected = [post.pk for post in reversed(posts)][:3]
+        self.assertEqual(self.feed(), expected)
+        Follow.objects.all().delete()
+        Follow.objects.create(
+            user=FeedTests.follower,
+            author=FeedTests.author
+        )
+        self.assertEqual(self.feed(), expected)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_pulled_at_read(self):
+        """Посты популярных авторов подмешиваются при чтении ленты."""
+        post = Post.objects.create(text='Пост звезды', author=FeedTests.author)
+        self.assertEqual(self.feed(), [])
+        self.client.force_login(FeedTests.follower)
+        for mode in ('pages', 'cursor'):
+            with self.subTest(mode=mode):
+                with self.settings(POSTS_PAGINATION_MODE=mode):
+                    response = self.client.get(reverse('posts:follow_index'))
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    [post]
+                )
+
+    @override_settings(
+        FEED_FANOUT_MAX_FOLLOWERS=2, FEED_BACKFILL_MAX_FOLLOWERS=1
+    )
+    def test_unpopular_author_is_backfilled_later(self):
+        """
+        Отписка от автора на пороге только помечает его; ленты
+        дополняет rebuild_feeds --backfill ниже второго порога.
+        """
+        others = [
+            User.objects.create_user(username=f'Other{number}')
+            for number in range(2)
+        ]
+        for other in others:
+            Follow.objects.create(user=other, author=FeedTests.author)
+        post = Post.objects.create(text='Пост', author=FeedTests.author)
+        self.assertEqual(self.feed(), [])
+        with CaptureQueriesContext(connection) as queries:
+            Follow.objects.filter(user=others[0]).delete()
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT')
+        ])
+        self.assertEqual(self.feed(), [])
+        self.client.force_login(FeedTests.follower)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        call_command('rebuild_feeds', '--backfill', stdout=StringIO())
+        self.assertEqual(self.feed(), [])
+        Follow.objects.filter(user=others[1]).delete()
+        call_command(
+            'rebuild_feeds', '--backfill', '--batch-size=1',
+            stdout=StringIO()
+        )
+        self.assertEqual(self.feed(), [post.pk])
+        self.assertFalse(UserCounter.objects.get(
+            user=FeedTests.author
+        ).feed_backfill_pending)
+
+    @override_settings(POSTS_PAGINATION_MODE='pages', POSTS_AMOUNT_PER_PAGE=2)
+    def test_feed_numbered_pages(self):
+        """Нумерованные страницы ленты читаются из FeedEntry."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=FeedTests.follower, author=other)
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=other if number % 2 else FeedTests.author
+            )
+            for number in range(5)
+        ]
+        self.client.force_login(FeedTests.follower)
+        url = reverse('posts:follow_index')
+        for popular in (False, True):
+            followers = 0 if popular else 10
+            with self.subTest(popular=popular), self.settings(
+                FEED_FANOUT_MAX_FOLLOWERS=followers
+            ):
+                pages = [
+                    list(self.client.get(
+                        url + f'?page={number}'
+                    ).context['page_obj'])
+                    for number in (1, 2, 3)
+                ]
+                self.assertEqual(
+                    [post for page in pages for post in page],
+                    list(reversed(posts))
+                )
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_feed_cursor_pages(self):
+        """Лента подписок листается курсорами."""
+        posts = [
+            Post.objects.create(text=f'Пост {number}', author=FeedTests.author)
+            for number in range(13)
+        ]
+        self.client.force_login(FeedTests.follower)
+        url = reverse('posts:follow_index')
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url + f'?after={first_page.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(
+            [*first_page, *second_page],
+            list(reversed(posts))
+        )
+
+    def test_rebuild_feeds(self):
+        """Команда rebuild_feeds собирает ленту по подпискам."""
+        Post.objects.bulk_create([Post(text='Пост', author=FeedTests.author)])
+        call_command('rebuild_feeds', stdout=StringIO())
+        self.assertEqual(len(self.feed()), 1)
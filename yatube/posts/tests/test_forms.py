@@ -1,24 +1,23 @@
-import shutil
-import tempfile
+import os
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.db import OperationalError
+from django.test import Client, override_settings
+from core.tests.utils import TestCase
 from django.urls import reverse
 from posts.models import Group, Post
+from posts.tests.utils import TempMediaMixin
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.conf import settings
 from PIL import Image
 from io import BytesIO
 from http import HTTPStatus
 
 
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
-
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostCreateFormTests(TestCase):
+class PostCreateFormTests(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -29,11 +28,6 @@ class PostCreateFormTests(TestCase):
             description='Тестовое описание'
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -109,6 +103,23 @@ class PostCreateFormTests(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(value, expected)
 
+    @override_settings(DB_LOCK_RETRY_DELAY=0)
+    def test_post_create_retry_keeps_single_upload(self):
+        """Повтор записи при занятой базе не сохраняет картинку заново."""
+        with mock.patch(
+            'posts.counts.change_count',
+            side_effect=[OperationalError('database is locked'), None]
+        ), self.assertLogs('core.db', 'WARNING'):
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Текст', 'image': self.get_image_file()},
+            )
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'posts')),
+            [os.path.basename(Post.objects.get().image.name)]
+        )
+
     def test_post_create_guest_client(self):
         """
         Проверяем, что не авторизованный пользователь
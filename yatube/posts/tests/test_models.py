@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from core.tests.utils import TestCase
 from posts.models import Post, Group
 from yatube.settings import TRIM_STRING_LENGTH
 
@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from core.tests.utils import TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.utils import QueryBudgetMixin
+
+
+User = get_user_model()
+
+POSTS_COUNT = 12
+
+
+class ViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Количество запросов страниц не зависит от числа постов
+    на странице: авторы, группы и комментарии не грузятся по одному.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(POSTS_COUNT):
+            commentator = User.objects.create_user(username=f'user{number}')
+            post = Post.objects.create(
+                author=cls.author if number % 2 else commentator,
+                group=cls.group,
+                text=f'Пост {number}'
+            )
+            Comment.objects.create(
+                post=post, author=commentator, text='Комментарий'
+            )
+            Follow.objects.get_or_create(user=cls.reader, author=commentator)
+        cls.post = post
+        cls.pages = (
+            ('posts:index', (), 4),
+            ('posts:group_list', (cls.group.slug,), 5),
+            ('posts:profile', (cls.author.username,), 6),
+            ('posts:follow_index', (), 5),
+            ('posts:post_detail', (cls.post.pk,), 4),
+            ('posts:post_comments', (cls.post.pk,), 3),
+            ('posts:index_cards', (), 3),
+            ('posts:follow_cards', (), 4),
+        )
+
+    def setUp(self):
+        self.client.force_login(ViewQueryBudgetTests.reader)
+
+    def test_views_fit_query_budget(self):
+        """Страницы укладываются в бюджет запросов."""
+        for name, args, budget in ViewQueryBudgetTests.pages:
+            with self.subTest(name=name):
+                cache.clear()
+                with self.assertMaxQueries(budget):
+                    self.client.get(reverse(name, args=args))
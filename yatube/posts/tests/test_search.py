@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from core.tests.utils import TestCase
+from django.urls import reverse
+from io import StringIO
+from posts import search
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.news = Post.objects.create(
+            author=SearchTests.user,
+            text='Важные новости о программировании на Python'
+        )
+        cls.phrase = Post.objects.create(
+            author=SearchTests.user,
+            text='Новости важные, но не все'
+        )
+        cls.other = Post.objects.create(
+            author=SearchTests.user,
+            text='Прогулка по осеннему парку'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': query, **params}
+        )
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_search_matches_word_forms_phrases_and_prefixes(self):
+        """Поиск находит формы слова, фразы и начала слов."""
+        cases = (
+            ('важная новость', {SearchTests.news.pk, SearchTests.phrase.pk}),
+            ('"важные новости"', {SearchTests.news.pk}),
+            ('прог*', {SearchTests.news.pk, SearchTests.other.pk}),
+            ('осень', {SearchTests.other.pk}),
+            ('python OR парк', set()),
+            ('"', set()),
+        )
+        for query, expected in cases:
+            with self.subTest(query=query):
+                _, found = self.found(query)
+                self.assertEqual(set(found), expected)
+
+    def test_search_results_ranked_and_paginated_by_cursor(self):
+        """Результаты идут по релевантности и листаются курсором."""
+        for number in range(3):
+            Post.objects.create(
+                author=SearchTests.user,
+                text='парк ' * (number + 1) + 'аллея'
+            )
+        with override_settings(POSTS_AMOUNT_PER_PAGE=2):
+            response, first = self.found('парк')
+            page_obj = response.context['page_obj']
+            _, second = self.found('парк', after=page_obj.next_cursor)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertFalse(set(first) & set(second))
+        self.assertNotIn(SearchTests.other.pk, first)
+        self.assertIn(SearchTests.other.pk, second)
+
+    def test_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = Post.objects.create(author=SearchTests.user, text='Черника')
+        post.text = 'Голубика'
+        post.save()
+        self.assertEqual(self.found('черника')[1], [])
+        self.assertEqual(self.found('голубика')[1], [post.pk])
+        post.delete()
+        self.assertEqual(self.found('голубика')[1], [])
+
+    def test_rebuild_search_index_command(self):
+        """Команда rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('прогулка')[1], [SearchTests.other.pk])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит формы слова через индекс."""
+        self.client.force_login(SearchTests.admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'прогулки'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list),
+            [SearchTests.other]
+        )
@@ -0,0 +1,229 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connections
+from django.test import override_settings
+from core.tests.utils import ExtraDatabasesMixin, TestCase
+from django.urls import reverse
+from io import StringIO
+from posts import search, sharding
+from posts.models import Comment, Follow, Post, PostKey
+
+
+User = get_user_model()
+
+SHARDS = ['shard1', 'shard2']
+
+
+@override_settings(POST_SHARDS=SHARDS, POSTS_PAGINATION_MODE='pages')
+class ShardingTests(ExtraDatabasesMixin, TestCase):
+    extra_databases = {
+        alias: {'PRAGMAS': {'foreign_keys': 'OFF'}} for alias in SHARDS
+    }
+    extra_databases_settings = {'SHARD_DATABASES': SHARDS}
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.first = User.objects.create_user(username='first')
+        cls.second = User.objects.create_user(username='second')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = self.client_class()
+        self.authorized_client.force_login(ShardingTests.reader)
+
+    def create_posts(self):
+        """Посты двух авторов вперемешку по времени."""
+        return [
+            Post.objects.create(author=author, text=f'Пост {number}')
+            for number, author in enumerate(
+                [ShardingTests.first, ShardingTests.second] * 3
+            )
+        ]
+
+    def test_posts_stored_in_author_shard(self):
+        """Пост и комментарии к нему лежат в шарде автора поста."""
+        post = Post.objects.create(author=ShardingTests.first, text='Пост')
+        Comment.objects.create(
+            post=post, author=ShardingTests.second, text='Комментарий'
+        )
+        shard = sharding.shard_for(ShardingTests.first.pk)
+        other, = set(SHARDS) - {shard}
+        self.assertTrue(Post.objects.using(shard).filter(pk=post.pk).exists())
+        self.assertFalse(Post.objects.using(other).exists())
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertEqual(Comment.objects.using(shard).count(), 1)
+        self.assertEqual(
+            PostKey.objects.get(pk=post.pk).author, ShardingTests.first
+        )
+
+    def test_post_is_indexed_in_author_shard(self):
+        """Текст поста попадает в поисковый индекс шарда автора."""
+        post = Post.objects.create(author=ShardingTests.first, text='Пост')
+        shard = sharding.shard_for(ShardingTests.first.pk)
+        with connections[shard].cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchall(), [(post.pk,)])
+
+    def test_ids_are_global(self):
+        """id постов не повторяются в разных шардах."""
+        posts = self.create_posts()
+        self.assertEqual(len({post.pk for post in posts}), len(posts))
+        self.assertEqual(
+            {post._state.db for post in posts}, set(SHARDS)
+        )
+
+    def test_queryset_merges_shards(self):
+        """Выборка без using() сливает шарды в порядке сортировки."""
+        posts = self.create_posts()
+        expected = [post.pk for post in reversed(posts)]
+        self.assertEqual(
+            [post.pk for post in Post.objects.all()], expected
+        )
+        self.assertEqual(
+            [post.pk for post in Post.objects.all()[1:4]], expected[1:4]
+        )
+        self.assertEqual(Post.objects.count(), len(posts))
+        self.assertEqual(Post.objects.all()[2:].count(), len(posts) - 2)
+        self.assertEqual(Post.objects.get(pk=posts[1].pk), posts[1])
+        self.assertEqual(Post.objects.last(), posts[0])
+        self.assertEqual(
+            Post.objects.filter(author=ShardingTests.first).update(
+                text='Новый текст'
+            ),
+            3
+        )
+
+    def test_index_merges_shards(self):
+        posts = self.create_posts()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']],
+            [post.pk for post in reversed(posts)]
+        )
+
+    def test_follow_index_merges_shards(self):
+        posts = self.create_posts()
+        Follow.objects.create(
+            user=ShardingTests.reader, author=ShardingTests.first
+        )
+        Follow.objects.create(
+            user=ShardingTests.reader, author=ShardingTests.second
+        )
+        for mode in ('pages', 'cursor'):
+            with self.subTest(mode=mode), self.settings(
+                POSTS_PAGINATION_MODE=mode
+            ):
+                response = self.authorized_client.get(
+                    reverse('posts:follow_index')
+                )
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    [post.pk for post in reversed(posts)]
+                )
+
+    def test_search_merges_shards(self):
+        """Поиск находит посты всех шардов и листает их курсором."""
+        posts = self.create_posts()
+        with self.settings(POSTS_AMOUNT_PER_PAGE=4):
+            response = self.client.get(
+                reverse('posts:post_search'), {'q': 'пост'}
+            )
+            page_obj = response.context['page_obj']
+            first = [post.pk for post in page_obj]
+            response = self.client.get(
+                reverse('posts:post_search'),
+                {'q': 'пост', 'after': page_obj.next_cursor}
+            )
+            second = [post.pk for post in response.context['page_obj']]
+        self.assertEqual(len(first), 4)
+        self.assertEqual(
+            sorted(first + second), sorted(post.pk for post in posts)
+        )
+        self.assertEqual(
+            {post._state.db for post in page_obj}, set(SHARDS)
+        )
+
+    def test_post_pages_and_comments(self):
+        """Страница поста, редактирование и комментарий работают в шарде."""
+        post = Post.objects.create(author=ShardingTests.first, text='Пост')
+        author_client = self.client_class()
+        author_client.force_login(ShardingTests.first)
+        author_client.post(
+            reverse('posts:post_edit', args=(post.pk,)),
+            data={'text': 'Исправленный пост'}
+        )
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            data={'text': 'Комментарий'}
+        )
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        post = response.context['post']
+        self.assertEqual(post.text, 'Исправленный пост')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            [comment.author for comment in post.comments.all()],
+            [ShardingTests.reader]
+        )
+        response = self.client.get(
+            reverse('posts:profile', args=(ShardingTests.first.username,))
+        )
+        self.assertEqual(
+            [post.pk for post in response.context['page_obj']], [post.pk]
+        )
+
+    def test_reshard_moves_posts(self):
+        """reshard переносит посты и комментарии в шард автора."""
+        with self.settings(POST_SHARDS=[]):
+            posts = self.create_posts()
+            Comment.objects.create(
+                post=posts[0], author=ShardingTests.reader, text='Комментарий'
+            )
+        call_command('reshard', stdout=StringIO())
+        self.assertFalse(Post.objects.using('default').exists())
+        self.assertFalse(Comment.objects.using('default').exists())
+        for post in posts:
+            with self.subTest(post=post.pk):
+                moved = Post.objects.get(pk=post.pk)
+                self.assertEqual(
+                    moved._state.db, sharding.shard_for(post.author_id)
+                )
+                self.assertEqual(
+                    (moved.created, moved.updated),
+                    (post.created, post.updated)
+                )
+        self.assertEqual(posts[0].pk, Comment.objects.get().post_id)
+        self.assertEqual(
+            set(PostKey.objects.values_list('pk', flat=True)),
+            {post.pk for post in posts}
+        )
+        with self.settings(POST_SHARDS=['shard1']):
+            call_command('reshard', stdout=StringIO())
+            self.assertEqual(
+                Post.objects.using('shard1').count(), len(posts)
+            )
+        self.assertFalse(Post.objects.using('shard2').exists())
+        response = self.client.get(
+            reverse('posts:post_search'), {'q': 'пост'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), len(posts)
+        )
+        with connections['shard2'].cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchall(), [])
+
+    def test_unsharded_commands_refuse(self):
+        """Пересчеты по основной базе с шардами не выполняются."""
+        Post.objects.create(author=ShardingTests.first, text='Пост')
+        for command in ('recount', 'rebuild_search_index', 'seed_data'):
+            with self.subTest(command=command):
+                with self.assertRaises(CommandError):
+                    call_command(command, stdout=StringIO())
+        ShardingTests.first.counters.refresh_from_db()
+        self.assertEqual(ShardingTests.first.counters.posts_count, 1)
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from core.tests.utils import TestCase
+from django.urls import reverse
+from io import BytesIO, StringIO
+from PIL import Image
+from core import metrics
+from posts import thumbnails
+from posts.models import Post
+from posts.tests.utils import TempMediaMixin
+from sorl.thumbnail.base import ThumbnailBackend
+from unittest import mock
+
+
+User = get_user_model()
+
+
+class ThumbnailPregenerationTests(TempMediaMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        image = Image.new('RGB', size=(960, 339), color=(0, 0, 0))
+        image_file = BytesIO()
+        image.save(image_file, 'gif')
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=ThumbnailPregenerationTests.user,
+            image=SimpleUploadedFile(
+                name='wide.gif',
+                content=image_file.getvalue()
+            )
+        )
+
+    def assert_page_does_not_create_thumbnails(self):
+        with mock.patch.object(
+            ThumbnailBackend, '_create_thumbnail'
+        ) as create_thumbnail:
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        self.assertContains(response, '<img')
+        create_thumbnail.assert_not_called()
+
+    def test_submitted_image_has_thumbnails(self):
+        """После обработки картинки страница не создает миниатюры."""
+        thumbnails.submit(self.post.image.name)
+        self.assert_page_does_not_create_thumbnails()
+
+    def test_metric_counts_created_variants(self):
+        """В метрику попадают только созданные варианты."""
+        metrics.flush()
+        metrics._connection().execute('DELETE FROM metrics')
+        for _ in range(2):
+            thumbnails.submit(self.post.image.name)
+        self.assertIn(
+            'yatube_thumbnails_generated_total '
+            f'{len(list(thumbnails.variant_options()))}',
+            metrics.render().splitlines()
+        )
+
+    def test_generate_thumbnails_command(self):
+        """Команда generate_thumbnails создает миниатюры старых картинок."""
+        with mock.patch(
+            'posts.management.commands.generate_thumbnails'
+            '.ProcessPoolExecutor',
+            mock.MagicMock(**{
+                'return_value.__enter__.return_value.map': map
+            })
+        ):
+            call_command('generate_thumbnails', stdout=StringIO())
+        self.assert_page_does_not_create_thumbnails()
+
+    def test_missing_thumbnails_fall_back_to_original(self):
+        """
+        Без вариантов страница показывает исходную картинку
+        и отдает ее пулу, а после обработки выводит варианты.
+        """
+        url = reverse('posts:index')
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            response = self.client.get(url)
+            self.client.get(reverse('posts:profile', args=('auth',)))
+        submit.assert_called_once_with(self.post.image.name)
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        self.assertNotContains(response, '<source')
+        thumbnails.submit(self.post.image.name)
+        self.assertContains(self.client.get(url), '<source type="image/webp"')
+
+    def test_post_card_renders_responsive_picture(self):
+        """Карточка поста выводит варианты картинки в srcset."""
+        thumbnails.submit(self.post.image.name)
+        response = self.client.get(reverse('posts:index'))
+        snippets = (
+            '<source type="image/webp"',
+            ' 480w, ',
+            f'sizes="{settings.POST_IMAGE_SIZES}"',
+            'loading="lazy"',
+            'width="960" height="339"',
+        )
+        for snippet in snippets:
+            with self.subTest(snippet=snippet):
+                self.assertContains(response, snippet)
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import Client
+from core.tests.utils import TestCase
 from http import HTTPStatus
 from django.urls import reverse
 from posts.models import Post, Group
@@ -44,6 +45,11 @@ class PostURLTests(TestCase):
             'posts/post_detail.html',
             (PostURLTests.post.id,)
         )
+        cls.post_search_url = (
+            'posts:post_search',
+            'posts/search.html',
+            ()
+        )
         cls.post_create_url = (
             'posts:post_create',
             'posts/create_post.html',
@@ -58,7 +64,8 @@ class PostURLTests(TestCase):
             PostURLTests.index_url,
             PostURLTests.group_list_url,
             PostURLTests.profile_url,
-            PostURLTests.post_detail_url
+            PostURLTests.post_detail_url,
+            PostURLTests.post_search_url
         )
         cls.private_urls = (
             PostURLTests.post_create_url,
@@ -1,20 +1,23 @@
-import shutil
-import tempfile
-
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import Client, TestCase, override_settings
+from django.test import Client, override_settings
+from core.tests.utils import TestCase
 from django import forms
+from posts import caching, counters
+from posts.utils import CursorPaginator, elided_page_range
 from posts.models import Post, Group, Follow
+from posts.tests.utils import TempMediaMixin
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.conf import settings
+from django.utils.crypto import get_random_string
+from django.core.paginator import Paginator
 from PIL import Image
 from io import BytesIO
 from http import HTTPStatus
-
-
-TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+import threading
 
 
 User = get_user_model()
@@ -234,6 +237,8 @@ class PostPagesTests(TestCase):
             ) for _ in range(12)
         ]
         Post.objects.bulk_create(posts_list)
+        # bulk_create не обновляет счетчики групп и авторов
+        counters.recount()
         paginated_urls = (
             PostPagesTests.index_url,
             PostPagesTests.group_list_url,
@@ -270,7 +275,7 @@ class PostPagesTests(TestCase):
             reverse(name)
         )
         response_old = response
-        new_post.delete()
+        Post.objects.filter(pk=new_post.pk).update(text='Измененный пост')
         response = self.authorized_client.get(
             reverse(name)
         )
@@ -281,9 +286,45 @@ class PostPagesTests(TestCase):
         )
         self.assertNotEqual(response.content, response_old.content)
 
+    def test_page_cache_invalidation(self):
+        """
+        Кэш страниц сбрасывается при изменении данных:
+        - главной при удалении поста,
+        - группы при переименовании автора,
+        - профиля при подписке.
+        """
+        new_post = Post.objects.create(
+            text='Новый пост',
+            author=PostPagesTests.user,
+            group=PostPagesTests.group
+        )
+        follower = User.objects.create_user(username='follower')
+        author = User.objects.get(pk=PostPagesTests.user.pk)
+        author.first_name = 'Новое имя'
+        changes = (
+            (PostPagesTests.index_url, new_post.delete),
+            (PostPagesTests.group_list_url, author.save),
+            (
+                PostPagesTests.profile_url,
+                lambda: Follow.objects.create(
+                    user=follower,
+                    author=PostPagesTests.user
+                )
+            ),
+        )
+        for (name, _, args), change in changes:
+            with self.subTest(name=name):
+                response_old = self.client.get(reverse(name, args=args))
+                self.assertEqual(
+                    self.client.get(reverse(name, args=args)).content,
+                    response_old.content
+                )
+                change()
+                response = self.client.get(reverse(name, args=args))
+                self.assertNotEqual(response.content, response_old.content)
+
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
-class PostWithImageViewTest(TestCase):
+class PostWithImageViewTest(TempMediaMixin, TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -294,11 +335,6 @@ class PostWithImageViewTest(TestCase):
             description='Тестовое описание'
         )
 
-    @classmethod
-    def tearDownClass(cls):
-        super().tearDownClass()
-        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
-
     def get_image_file(self):
         image = Image.new('RGBA', size=(1, 1), color=(0, 0, 0))
         image_file = BytesIO()
@@ -346,6 +382,8 @@ class PostWithImageViewTest(TestCase):
         )
         for name, args in post_urls:
             with self.subTest(name=name):
+                # Карточка поста рендерится только без кэша фрагментов
+                cache.clear()
                 response = self.client.get(
                     reverse(name, args=args)
                 )
@@ -515,3 +553,577 @@ class FollowViewTest(TestCase):
             reverse('posts:follow_index')
         )
         self.assertNotContains(response, post.text)
+
+
+class ElidedPageRangeTests(TestCase):
+    def numbers(self, number, count=100_000):
+        page_obj = Paginator(range(count), 1).get_page(number)
+        return list(elided_page_range(page_obj))
+
+    def test_page_range_is_elided(self):
+        """Первая, последняя и соседние страницы, пропуски — None."""
+        cases = (
+            (1, 100_000, [1, 2, 3, None, 100_000]),
+            (4, 100_000, [1, 2, 3, 4, 5, 6, None, 100_000]),
+            (50, 100_000, [1, None, 48, 49, 50, 51, 52, None, 100_000]),
+            (100_000, 100_000, [1, None, 99_998, 99_999, 100_000]),
+            (3, 7, [1, 2, 3, 4, 5, 6, 7]),
+        )
+        for number, count, expected in cases:
+            with self.subTest(number=number, count=count):
+                self.assertEqual(self.numbers(number, count), expected)
+
+    def test_paginator_template_is_elided(self):
+        """Паджинатор страницы выводит окно номеров, а не все страницы."""
+        user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=user, text=f'Пост {number}') for number in range(50)
+        )
+        cache.clear()
+        with self.settings(POSTS_AMOUNT_PER_PAGE=1):
+            response = self.client.get(reverse('posts:index'), {'page': 25})
+        self.assertContains(response, '?page=24"')
+        self.assertContains(response, '?page=50"')
+        self.assertNotContains(response, '?page=10"')
+        self.assertContains(response, '&hellip;', count=2)
+
+
+def query_plan(queryset):
+    """
+    EXPLAIN QUERY PLAN выборки одной строкой. Параметры передаются
+    отдельно, как в настоящем запросе: с подставленными значениями
+    SQLite может выбрать другой план.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return ' '.join(row[-1] for row in cursor.fetchall())
+
+
+@override_settings(POSTS_PAGINATION_MODE='cursor')
+class PostCursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create([
+            Post(
+                text=f'Тестовый пост {number}',
+                author=PostCursorPaginatorTests.user,
+                group=PostCursorPaginatorTests.group
+            ) for number in range(13)
+        ])
+        cls.paginated_urls = (
+            ('posts:index', ()),
+            ('posts:group_list', (PostCursorPaginatorTests.group.slug,)),
+            ('posts:profile', (PostCursorPaginatorTests.user,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и предыдущую страницы."""
+        for name, args in PostCursorPaginatorTests.paginated_urls:
+            with self.subTest(name=name):
+                url = reverse(name, args=args)
+                first_page = self.client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), 10)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.client.get(
+                    url + f'?after={first_page.next_cursor}'
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                previous_page = self.client.get(
+                    url + f'?before={second_page.previous_cursor}'
+                ).context['page_obj']
+                self.assertEqual(
+                    list(previous_page.object_list),
+                    list(first_page.object_list)
+                )
+                self.assertFalse(previous_page.has_previous())
+                posts = [*first_page.object_list, *second_page.object_list]
+                self.assertEqual(posts, list(Post.objects.all()))
+
+    def test_cursor_pages_do_not_count(self):
+        """В курсорном режиме не выполняется COUNT(*)."""
+        name, args = PostCursorPaginatorTests.paginated_urls[0]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse(name, args=args))
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'])
+
+    def test_deep_cursor_seeks_index_range(self):
+        """После курсора страница читается диапазоном индекса."""
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        position = paginator.key(Post.objects.all()[10])
+        for backwards in (False, True):
+            with self.subTest(backwards=backwards):
+                plan = query_plan(paginator.seek(position, backwards)[:5])
+                self.assertIn('post_created_id_idx (created', plan)
+                self.assertNotIn('SCAN', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        name, args = PostCursorPaginatorTests.paginated_urls[0]
+        response = self.client.get(
+            reverse(name, args=args) + '?after=broken'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+@override_settings(COMMENTS_PER_CHUNK=2)
+class CommentChunkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=CommentChunkTests.user
+        )
+        for number in range(5):
+            cls.post.comments.create(
+                author=CommentChunkTests.user, text=f'Комментарий {number}'
+            )
+        cls.chunks = (
+            ('Комментарий 0', 'Комментарий 1'),
+            ('Комментарий 2', 'Комментарий 3'),
+            ('Комментарий 4',),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def texts(self, response):
+        return tuple(
+            comment.text for comment in response.context['comments']
+        )
+
+    def test_comments_are_loaded_in_chunks(self):
+        """post_detail показывает первую порцию, остальные — фрагменты."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(CommentChunkTests.post.pk,))
+        )
+        more_url = reverse(
+            'posts:post_comments', args=(CommentChunkTests.post.pk,)
+        )
+        for number, expected in enumerate(CommentChunkTests.chunks):
+            with self.subTest(chunk=number):
+                self.assertEqual(self.texts(response), expected)
+                next_cursor = response.context['comments'].next_cursor
+                if next_cursor is None:
+                    self.assertNotContains(response, more_url)
+                    break
+                self.assertContains(
+                    response,
+                    f'data-autoload="{more_url}?after={next_cursor}"'
+                )
+                response = self.client.get(more_url, {'after': next_cursor})
+        self.assertEqual(number, len(CommentChunkTests.chunks) - 1)
+
+    def test_chunk_is_cached(self):
+        """Порция кэшируется и сбрасывается новым комментарием."""
+        url = reverse('posts:post_comments', args=(CommentChunkTests.post.pk,))
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        CommentChunkTests.post.comments.first().delete()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(
+            self.texts(response), ('Комментарий 1', 'Комментарий 2')
+        )
+
+
+@override_settings(POSTS_AMOUNT_PER_PAGE=2)
+class PostCardsEndpointTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+        for number in range(5):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=PostCardsEndpointTests.author,
+                group=PostCardsEndpointTests.group
+            )
+        Follow.objects.create(
+            user=PostCardsEndpointTests.reader,
+            author=PostCardsEndpointTests.author
+        )
+        cls.urls = (
+            reverse('posts:index_cards'),
+            reverse('posts:group_cards', args=('TestSlug',)),
+            reverse('posts:profile_cards', args=('author',)),
+            reverse('posts:follow_cards'),
+        )
+        cls.texts = [f'Пост {number}' for number in range(4, -1, -1)]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PostCardsEndpointTests.reader)
+
+    def test_html_batches(self):
+        """HTML-порции без макета, следующая — в заголовке Link."""
+        for url in PostCardsEndpointTests.urls:
+            with self.subTest(url=url):
+                content, next_url = '', url
+                while next_url:
+                    response = self.authorized_client.get(next_url)
+                    self.assertNotContains(response, '<html')
+                    content += response.content.decode()
+                    link = response.get('Link')
+                    next_url = link and link[1:link.index('>')]
+                positions = [
+                    content.index(f'<p>{text}</p>')
+                    for text in PostCardsEndpointTests.texts
+                ]
+                self.assertEqual(positions, sorted(positions))
+
+    def test_json_batches(self):
+        """JSON-порции с курсором следующей порции."""
+        url = reverse('posts:index_cards')
+        data = self.client.get(url, {'format': 'json'}).json()
+        self.assertIn('Пост 4', data['html'])
+        self.assertNotIn('Пост 2', data['html'])
+        data = self.client.get(
+            url, {'format': 'json', 'after': data['next_cursor']}
+        ).json()
+        self.assertIn('Пост 2', data['html'])
+        self.assertIn('Пост 1', data['html'])
+        data = self.client.get(
+            url, {'format': 'json', 'after': data['next_cursor']}
+        ).json()
+        self.assertIn('Пост 0', data['html'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_follow_cards_requires_login(self):
+        response = self.client.get(reverse('posts:follow_cards'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_pages_link_to_cards(self):
+        """В курсорном режиме страница ленты знает адрес порций."""
+        response = self.client.get(reverse('posts:index'))
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(
+            response,
+            f'data-autoload="{reverse("posts:index_cards")}'
+            f'?after={next_cursor}"'
+        )
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=PageCacheTests.user
+        )
+
+    def setUp(self):
+        # События других тестов, еще не записанные в кэш
+        caching.flush_events()
+        cache.clear()
+
+    def test_hit_miss_and_stale(self):
+        """
+        Кэш страниц отдает свежую копию, а во время чужой пересборки —
+        устаревшую; события попадают в счетчики.
+        """
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response_old = self.client.get(url)
+        self.assertEqual(response_old['X-Cache'], 'HIT')
+        Post.objects.create(text='Новый пост', author=PageCacheTests.user)
+        lock_key = caching.make_page_key(
+            'index_page', response.wsgi_request
+        ) + ':lock'
+        cache.add(lock_key, 1)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'STALE')
+        self.assertEqual(response.content, response_old.content)
+        cache.delete(lock_key)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Новый пост')
+        self.assertEqual(
+            caching.page_cache_stats(),
+            {'hit': 1, 'miss': 2, 'stale': 1}
+        )
+
+    @override_settings(PAGE_CACHE_SOFT_TIMEOUT=0)
+    def test_soft_timeout(self):
+        """После мягкого таймаута страница пересобирается."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_cold_page_waits_for_entry(self):
+        """Без копии в кэше запрос ждет страницу, которую собирает другой."""
+        url = reverse('posts:index')
+        response_old = self.client.get(url)
+        key = caching.make_page_key('index_page', response_old.wsgi_request)
+        entry = cache.get(key)
+        cache.delete(key)
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.1, cache.set, (key, entry)).start()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.content, response_old.content)
+
+    @override_settings(PAGE_CACHE_WAIT_TIMEOUT=0.1)
+    def test_cold_page_wait_timeout(self):
+        """Не дождавшись записи, запрос собирает страницу сам."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        key = caching.make_page_key('index_page', response.wsgi_request)
+        cache.delete(key)
+        cache.add(f'{key}:lock', 1)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIsNone(cache.get(key))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=ConditionalGetTests.user,
+            group=ConditionalGetTests.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('TestSlug',)),
+            reverse('posts:profile', args=('auth',)),
+            reverse('posts:post_detail', args=(cls.post.pk,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTests.user)
+
+    def test_not_modified(self):
+        """Актуальная копия клиента получает 304 без запросов к базе."""
+        for url in ConditionalGetTests.urls:
+            for client in (self.client, self.authorized_client):
+                with self.subTest(url=url, client=client):
+                    client.get(url)
+                    etag = client.get(url)['ETag']
+                    with CaptureQueriesContext(connection) as queries:
+                        response = client.get(
+                            url, HTTP_IF_NONE_MATCH=etag
+                        )
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+                    self.assertEqual(response.content, b'')
+                    if client is self.client:
+                        self.assertEqual(len(queries), 0)
+
+    def test_last_modified_for_anonymous(self):
+        """Last-Modified отдается только анонимам."""
+        url = reverse('posts:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(
+            self.authorized_client.get(url).has_header('Last-Modified')
+        )
+
+    def test_etag_follows_changes(self):
+        """ETag меняется с новым постом, комментарием и номером страницы."""
+        index = reverse('posts:index')
+        detail = reverse(
+            'posts:post_detail', args=(ConditionalGetTests.post.pk,)
+        )
+        self.client.get(detail)
+        index_etag = self.client.get(index)['ETag']
+        detail_etag = self.client.get(detail)['ETag']
+        self.assertNotEqual(
+            self.client.get(index + '?page=2')['ETag'], index_etag
+        )
+        ConditionalGetTests.post.comments.create(
+            author=ConditionalGetTests.user, text='Комментарий'
+        )
+        response = self.client.get(detail, HTTP_IF_NONE_MATCH=detail_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Комментарий')
+        Post.objects.create(text='Новый пост', author=ConditionalGetTests.user)
+        response = self.client.get(index, HTTP_IF_NONE_MATCH=index_etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новый пост')
+
+    def test_etag_follows_csrf_token(self):
+        """Новый CSRF-токен пользователя — новая копия страницы с формой."""
+        detail = reverse(
+            'posts:post_detail', args=(ConditionalGetTests.post.pk,)
+        )
+        self.authorized_client.get(detail)
+        etag = self.authorized_client.get(detail)['ETag']
+        self.assertEqual(
+            self.authorized_client.get(
+                detail, HTTP_IF_NONE_MATCH=etag
+            ).status_code,
+            HTTPStatus.NOT_MODIFIED
+        )
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = (
+            get_random_string(64)
+        )
+        response = self.authorized_client.get(
+            detail, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class DeferredFragmentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(
+            text='<!--deferred:header-->',
+            author=DeferredFragmentTests.author
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(DeferredFragmentTests.reader)
+        self.author_client = Client()
+        self.author_client.force_login(DeferredFragmentTests.author)
+
+    def test_users_share_cached_page(self):
+        """Страница из кэша общая, а шапка у каждого своя."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Войти')
+        for client, username in (
+            (self.reader_client, 'reader'),
+            (self.author_client, 'author'),
+        ):
+            with self.subTest(username=username):
+                response = client.get(url)
+                self.assertEqual(response['X-Cache'], 'HIT')
+                self.assertContains(response, f'Пользователь: {username}')
+                self.assertContains(response, 'Избранные авторы')
+        self.assertNotContains(self.client.get(url), 'Пользователь:')
+
+    def test_follow_button(self):
+        """Кнопка подписки на странице из кэша зависит от читателя."""
+        url = reverse('posts:profile', args=('author',))
+        self.assertNotContains(self.author_client.get(url), 'Подписаться')
+        self.assertContains(self.reader_client.get(url), 'Подписаться')
+        Follow.objects.create(
+            user=DeferredFragmentTests.reader,
+            author=DeferredFragmentTests.author
+        )
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+
+    def test_post_detail_fragments(self):
+        """Форма комментария и правка поста — только своим."""
+        url = reverse(
+            'posts:post_detail', args=(DeferredFragmentTests.post.pk,)
+        )
+        edit_url = reverse(
+            'posts:post_edit', args=(DeferredFragmentTests.post.pk,)
+        )
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotContains(response, 'Добавить комментарий')
+        response = self.reader_client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        self.assertNotContains(response, edit_url)
+        self.assertContains(self.author_client.get(url), edit_url)
+
+    def test_markers_in_text_are_escaped(self):
+        """Метку в тексте поста не подставить: текст экранируется."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, '&lt;!--deferred:header--&gt;')
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='TestSlug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=PostCardCacheTests.user,
+            group=PostCardCacheTests.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, **context):
+        post = Post.objects.get(pk=PostCardCacheTests.post.pk)
+        return str(caching.render_post_cards([post], **context))
+
+    def test_card_is_cached(self):
+        """Повторный рендер карточки берет ее из кэша."""
+        card = self.render(bool_flag=True)
+        Post.objects.filter(pk=PostCardCacheTests.post.pk).update(
+            text='Измененный пост'
+        )
+        self.assertEqual(self.render(bool_flag=True), card)
+
+    def test_card_key_follows_changes(self):
+        """Карточка обновляется при правке поста и новом комментарии."""
+        card = self.render(bool_flag=True)
+        post = Post.objects.get(pk=PostCardCacheTests.post.pk)
+        post.text = 'Измененный пост'
+        post.save()
+        self.assertIn('Измененный пост', self.render(bool_flag=True))
+        post.comments.create(author=PostCardCacheTests.user, text='Коммент')
+        self.assertIn('Комментариев: 1', self.render(bool_flag=True))
+        self.assertNotEqual(self.render(bool_flag=True), card)
+
+    def test_card_varies_on_context(self):
+        """Карточка зависит от bool_flag и группы в контексте."""
+        cards = {
+            self.render(),
+            self.render(bool_flag=True),
+            self.render(bool_flag=True, group=PostCardCacheTests.group),
+        }
+        self.assertEqual(len(cards), 3)
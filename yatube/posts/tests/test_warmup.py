@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
+from core.tests.utils import TransactionTestCase
+from django.urls import reverse
+from io import StringIO
+from posts import warmup
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@override_settings(POSTS_AMOUNT_PER_PAGE=2)
+class WarmupTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.quiet = Group.objects.create(title='Тихая', slug='quiet')
+        self.busy = Group.objects.create(title='Активная', slug='busy')
+        Post.objects.create(author=self.reader, text='Пост', group=self.quiet)
+        for number in range(4):
+            Post.objects.create(
+                author=self.author, text=f'Пост {number}', group=self.busy
+            )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_hot_paths(self):
+        """Сначала лента, затем самые активные группы и авторы."""
+        self.assertEqual(warmup.hot_paths(2, 1, 1), [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=('busy',)),
+            reverse('posts:profile', args=('author',)),
+        ])
+
+    @override_settings(POSTS_PAGINATION_MODE='cursor')
+    def test_cursor_index_paths(self):
+        """В курсорном режиме адреса совпадают со ссылками страниц."""
+        paths = warmup.index_paths(5)
+        self.assertEqual(len(paths), 3)
+        for path, next_path in zip(paths, paths[1:]):
+            with self.subTest(path=path):
+                page_obj = self.client.get(path).context['page_obj']
+                self.assertTrue(
+                    next_path.endswith(f'?after={page_obj.next_cursor}')
+                )
+
+    def test_warm_cache_command(self):
+        """После прогрева горячие страницы отдаются из кэша."""
+        out = StringIO()
+        call_command(
+            'warm_cache', index_pages=2, groups=1, authors=1, workers=2,
+            stdout=out
+        )
+        self.assertIn('Прогрето страниц: 4 из 4', out.getvalue())
+        for path in warmup.hot_paths(2, 1, 1):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path)['X-Cache'], 'HIT')
+
+    def test_budget(self):
+        """Страницы, не успевшие за бюджет, пропускаются."""
+        out = StringIO()
+        call_command('warm_cache', budget=0, stdout=out)
+        self.assertIn('Прогрето страниц: 0', out.getvalue())
+        self.assertEqual(
+            self.client.get(reverse('posts:index'))['X-Cache'], 'MISS'
+        )
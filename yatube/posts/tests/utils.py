@@ -0,0 +1,49 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+class TempMediaMixin:
+    """
+    MEDIA_ROOT во временном каталоге на время тестов класса:
+    картинки и миниатюры не попадают в проект, а каталог
+    удаляется в tearDownClass.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class QueryBudgetMixin:
+    """Проверка, что код укладывается в бюджет запросов к БД."""
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        self.assertLessEqual(
+            executed,
+            budget,
+            'Выполнено запросов: {}, бюджет: {}\n{}'.format(
+                executed,
+                budget,
+                '\n'.join(
+                    query['sql'] for query in context.captured_queries
+                )
+            )
+        )
@@ -0,0 +1,204 @@
+"""
+Варианты картинок постов и их заблаговременное создание.
+Каждая картинка нарезается по ширинам POST_IMAGE_WIDTHS в форматах
+POST_IMAGE_FORMATS. Варианты создаются в пуле процессов сразу
+после сохранения поста, а размеры каждого варианта хранятся
+в хранилище метаданных sorl, поэтому при показе страницы
+картинки не открываются.
+Если вариантов еще нет (картинка загружена до появления пула
+или задача потерялась), страница показывает исходную картинку,
+а варианты создаются в пуле.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from sorl.thumbnail.base import ThumbnailBackend
+
+from core import metrics, timing
+
+
+logger = logging.getLogger(__name__)
+
+PENDING_PREFIX = 'thumbnails_pending'
+
+_executor = None
+
+
+class MissingThumbnail(Exception):
+    """Варианта картинки еще нет."""
+
+
+class PregeneratedBackend(ThumbnailBackend):
+    """Только готовые варианты: вместо создания — MissingThumbnail."""
+
+    def _create_thumbnail(self, *args, **kwargs):
+        raise MissingThumbnail
+
+
+pregenerated = PregeneratedBackend()
+
+
+class CountingBackend(ThumbnailBackend):
+    """Создает недостающие варианты и считает созданные."""
+
+    def __init__(self):
+        self.created = 0
+
+    def _create_thumbnail(self, *args, **kwargs):
+        super()._create_thumbnail(*args, **kwargs)
+        self.created += 1
+
+
+def close_connections():
+    """Соединения с БД родительского процесса не переживают fork."""
+    connections.close_all()
+
+
+def get_executor():
+    """
+    Пул процессов для вариантов картинок. Пул создается
+    из потока запроса, а fork многопоточного процесса может
+    унести в дочерний чужие блокировки, поэтому процессы
+    запускаются через spawn и сами настраивают Django.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
+    return _executor
+
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+
+def variant_options():
+    """Пары (геометрия, параметры sorl) для всех вариантов картинки."""
+    box_width, box_height = settings.POST_IMAGE_BOX
+    for image_format in settings.POST_IMAGE_FORMATS:
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * box_height / box_width)
+            # Растягиваем маленькие картинки только до основной рамки:
+            # более широкие варианты получились бы из тех же пикселей
+            yield f'{width}x{height}', {
+                'format': image_format,
+                'upscale': width <= box_width,
+            }
+
+
+def picture(image):
+    """
+    Варианты картинки для тега <picture>: источники srcset
+    по форматам и запасная картинка основного размера.
+    """
+    box_width = settings.POST_IMAGE_BOX[0]
+    try:
+        with timing.measure('thumbnails'):
+            variants = [
+                (
+                    geometry,
+                    options,
+                    pregenerated.get_thumbnail(image, geometry, **options)
+                )
+                for geometry, options in variant_options()
+            ]
+    except MissingThumbnail:
+        submit_missing(image.name)
+        return {'sources': [], 'srcset': '', 'image': image}
+    sources = {}
+    fallback = None
+    for geometry, options, thumbnail in variants:
+        widths = sources.setdefault(options['format'], {})
+        # Не растянутый вариант маленькой картинки не добавляет деталей
+        if not widths or thumbnail.width > max(widths):
+            widths[thumbnail.width] = thumbnail.url
+        if int(geometry.split('x')[0]) <= box_width:
+            fallback = thumbnail
+    sources = [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{url} {width}w' for width, url in sorted(widths.items())
+            ),
+        }
+        for image_format, widths in sources.items()
+    ]
+    return {
+        'sources': sources[:-1],
+        'srcset': sources[-1]['srcset'],
+        'image': fallback,
+    }
+
+
+def refresh_posts(image_name):
+    """
+    Посты, показанные с исходной картинкой, сохраняются заново:
+    меняется отметка изменения в ключе карточки и версии страниц.
+    """
+    from .models import Post
+    for post in Post.objects.filter(image=image_name):
+        post.save(update_fields=['updated'])
+
+
+def generate(image_name):
+    """Создает недостающие варианты картинки."""
+    backend = CountingBackend()
+    for geometry, options in variant_options():
+        backend.get_thumbnail(image_name, geometry, **options)
+    # Готовые варианты только читаются из хранилища метаданных
+    # и в метрику не попадают. В процессах пула нет запросов,
+    # после которых пишутся метрики
+    if backend.created:
+        metrics.inc('yatube_thumbnails_generated_total', backend.created)
+        metrics.flush()
+    pending_key = f'{PENDING_PREFIX}:{image_name}'
+    if cache.get(pending_key) is not None:
+        refresh_posts(image_name)
+        cache.delete(pending_key)
+    return image_name
+
+
+def log_failure(future):
+    error = future.exception()
+    if error is not None:
+        logger.error('Не удалось создать миниатюры', exc_info=error)
+
+
+def submit(image_name):
+    """Отдает картинку пулу процессов или обрабатывает сразу."""
+    if not settings.THUMBNAIL_WORKERS:
+        with timing.measure('thumbnails'):
+            generate(image_name)
+        return
+    get_executor().submit(generate, image_name).add_done_callback(
+        log_failure
+    )
+
+
+def submit_missing(image_name):
+    """
+    Отдает пулу картинку без вариантов, замеченную при показе.
+    Пока задача не выполнена (но не дольше THUMBNAIL_PENDING_TIMEOUT),
+    другие показы ее не повторяют.
+    """
+    if cache.add(
+        f'{PENDING_PREFIX}:{image_name}', 1,
+        settings.THUMBNAIL_PENDING_TIMEOUT
+    ):
+        submit(image_name)
+
+
+def schedule(image_name):
+    """Создает миниатюры после фиксации транзакции с постом."""
+    transaction.on_commit(lambda: submit(image_name))
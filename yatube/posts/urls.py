@@ -7,12 +7,29 @@ app_name = 'posts'
 urlpatterns = [
     # Url к постам, главная страница
     path('', views.index, name='index'),
+    # Url к следующим порциям карточек лент для бесконечной прокрутки
+    path('cards/', views.index_cards, name='index_cards'),
+    path('group/<slug:slug>/cards/', views.group_cards, name='group_cards'),
+    path(
+        'profile/<str:username>/cards/',
+        views.profile_cards,
+        name='profile_cards'
+    ),
+    path('follow/cards/', views.follow_cards, name='follow_cards'),
+    # Url к полнотекстовому поиску по постам
+    path('search/', views.post_search, name='post_search'),
     # Url к всем постам определенной группы
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Url к профилю username
     path('profile/<str:username>/', views.profile, name='profile'),
     # Url к деталям по посту из post_id
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Url к следующей порции комментариев поста
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Url к созданию поста
     path('create/', views.post_create, name='post_create'),
     # Url к редактированию поста по post_id
@@ -1,9 +1,312 @@
-from django.core.paginator import Paginator
-from yatube.settings import POSTS_AMOUNT_PER_PAGE
+import base64
+import binascii
 
+from django.conf import settings
+from django.core.paginator import (
+    EmptyPage, Page, PageNotAnInteger, Paginator
+)
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def paginate_page(request, posts_list):
-    """Паджинация постов."""
-    paginator = Paginator(posts_list, POSTS_AMOUNT_PER_PAGE)
+from . import counts
+
+
+PAGINATION_MODE_CURSOR = 'cursor'
+
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(values):
+    """Кодирует значения ключа (created, id) в непрозрачный токен."""
+    created, pk = values
+    raw = f'{created.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Декодирует токен в значения ключа (created, id).
+    Для пустого или испорченного токена возвращает None.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        created, pk = raw.decode().split(CURSOR_SEPARATOR)
+        created = parse_datetime(created)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+class CursorPage:
+    """
+    Страница курсорной паджинации.
+    Повторяет интерфейс Page, который нужен шаблонам,
+    но ничего не знает об общем количестве объектов.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage after {self.previous_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Паджинация по ключу (created, id): страница выбирается
+    условием WHERE по индексу, без COUNT(*) и OFFSET.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-created', '-id')):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.ordering = ordering
+
+    def key(self, obj):
+        """Значения ключа паджинации для объекта."""
+        return tuple(
+            getattr(obj, field.lstrip('-')) for field in self.ordering
+        )
+
+    def encode(self, values):
+        """Токен курсора для значений ключа."""
+        return encode_cursor(values)
+
+    def decode(self, token):
+        """Значения ключа из токена или None."""
+        return decode_cursor(token)
+
+    def seek_filter(self, position, backwards=False):
+        """
+        Условие 'строго после position' в порядке обхода.
+        Граница по first отдельным условием дает SQLite один диапазон
+        индекса (first, second) в нужном порядке; без нее OR из двух
+        условий читается двумя поисками и сортируется целиком.
+        """
+        (first, second), (first_value, second_value) = (
+            self.ordering, position
+        )
+        lookup = 'lt' if first.startswith('-') != backwards else 'gt'
+        first, second = first.lstrip('-'), second.lstrip('-')
+        return Q(**{f'{first}__{lookup}e': first_value}) & (
+            Q(**{f'{first}__{lookup}': first_value})
+            | Q(**{f'{second}__{lookup}': second_value})
+        )
+
+    def seek(self, position, backwards=False):
+        """Выборка объектов после position в порядке обхода."""
+        ordering = self.ordering
+        if backwards:
+            ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            ]
+        queryset = self.object_list.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position, backwards))
+        return queryset
+
+    def fetch(self, position, backwards, limit):
+        """Возвращает до limit объектов после position в порядке обхода."""
+        return list(self.seek(position, backwards)[:limit])
+
+    def get_page(self, after=None, before=None):
+        """
+        Возвращает страницу после курсора after или перед курсором before.
+        Без курсоров (или с испорченным курсором) — первую страницу.
+        """
+        position = self.decode(before)
+        backwards = position is not None
+        if not backwards:
+            position = self.decode(after)
+        items = self.fetch(position, backwards, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if backwards:
+            items.reverse()
+        if not items:
+            return CursorPage(items)
+        first_cursor = self.encode(self.key(items[0]))
+        last_cursor = self.encode(self.key(items[-1]))
+        if backwards:
+            return CursorPage(
+                items,
+                next_cursor=last_cursor,
+                previous_cursor=first_cursor if has_more else None
+            )
+        return CursorPage(
+            items,
+            next_cursor=last_cursor if has_more else None,
+            previous_cursor=first_cursor if position is not None else None
+        )
+
+
+class OpenEndedPage(Page):
+    """Страница без точного количества: следующая есть, если есть посты."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Нумерованная паджинация с готовым количеством постов:
+    денормализованным счетчиком (count) или из кэша counts (scope).
+    Если количество известно только приблизительно, номер страницы
+    не ограничивается последней посчитанной страницей.
+    """
+
+    def __init__(self, object_list, per_page, scope=None, count=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.scope = scope
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return counts.get_count(self.scope, self.object_list)
+
+    @cached_property
+    def approximate(self):
+        return self.known_count is None and counts.is_approximate(self.count)
+
+    def validate_number(self, number):
+        if not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        if number > self.num_pages:
+            bottom = (number - 1) * self.per_page
+            if not self.object_list[bottom:bottom + 1]:
+                raise EmptyPage('На странице нет результатов')
+        return number
+
+    def page(self, number):
+        if not self.approximate:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return OpenEndedPage(
+            objects[:self.per_page],
+            number,
+            self,
+            has_more=len(objects) > self.per_page
+        )
+
+
+def elided_page_range(page_obj, on_each_side=2, on_ends=1):
+    """
+    Номера страниц для паджинатора: on_ends первых и последних,
+    по on_each_side соседей текущей, на месте пропусков — None.
+    Число номеров не зависит от числа страниц, диапазон целиком
+    не строится.
+    """
+    number = page_obj.number
+    num_pages = page_obj.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        yield from range(1, num_pages + 1)
+        return
+    if number > on_each_side + on_ends + 1:
+        yield from range(1, on_ends + 1)
+        yield None
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield None
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+def comment_chunk(comments, after=None):
+    """
+    Порция комментариев после курсора after, старые первыми,
+    по индексу (post, created, id) и с авторами.
+    """
+    return CursorPaginator(
+        comments.with_authors(),
+        settings.COMMENTS_PER_CHUNK,
+        ordering=('created', 'id')
+    ).get_page(after=after)
+
+
+def paginate_page(
+    request,
+    posts_list,
+    scope=None,
+    cursor_paginator_class=CursorPaginator,
+    count=None
+):
+    """
+    Паджинация постов.
+    В курсорном режиме (POSTS_PAGINATION_MODE = 'cursor'
+    или в запросе есть ?after= / ?before=) страница выбирается
+    по ключу (created, id), иначе — по номеру ?page=.
+    Для нумерованных страниц количество постов берется из count
+    (денормализованного счетчика) или из кэша счетчиков по scope;
+    scope может быть функцией, если ее вычисление требует запросов.
+    cursor_paginator_class позволяет читать курсорные страницы
+    не из posts_list, а из другого источника (например, ленты подписок).
+    """
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    if (
+        settings.POSTS_PAGINATION_MODE == PAGINATION_MODE_CURSOR
+        or after
+        or before
+    ):
+        paginator = cursor_paginator_class(
+            posts_list, settings.POSTS_AMOUNT_PER_PAGE
+        )
+        return paginator.get_page(after=after, before=before)
+    if scope is None and count is None:
+        paginator = Paginator(posts_list, settings.POSTS_AMOUNT_PER_PAGE)
+    else:
+        paginator = CachedCountPaginator(
+            posts_list,
+            settings.POSTS_AMOUNT_PER_PAGE,
+            scope() if callable(scope) else scope,
+            count
+        )
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
@@ -1,16 +1,68 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import models
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+
+from core.db import retry_on_lock, retry_save
+from . import caching, counts, feeds, search, thumbnails
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User
-from .utils import paginate_page
+from .models import Comment, Post, Group, User
+from .utils import CursorPaginator, comment_chunk, paginate_page
+
+
+def store_uploads(instance):
+    """
+    Сохраняет загруженные файлы instance в хранилище заранее,
+    до транзакции: повтор записи в базу не сохраняет их заново.
+    """
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            field.pre_save(instance, add=instance._state.adding)
+
+
+def render_cards(request, paginator, **options):
+    """
+    Порция карточек ленты после ?after= из курсорного paginator
+    для бесконечной прокрутки: HTML-фрагмент со ссылкой на следующую
+    порцию в заголовке Link или, с ?format=json,
+    JSON {"html": ..., "next_cursor": ...}.
+    options передаются в render_post_cards.
+    """
+    page_obj = paginator.get_page(after=request.GET.get('after'))
+    cards = caching.render_post_cards(page_obj, **options)
+    if request.GET.get('format') == 'json':
+        return JsonResponse(
+            {'html': cards, 'next_cursor': page_obj.next_cursor},
+            json_dumps_params={'ensure_ascii': False}
+        )
+    response = HttpResponse(cards)
+    if page_obj.has_next():
+        response['Link'] = (
+            f'<{request.path}?after={page_obj.next_cursor}>; rel="next"'
+        )
+    return response
+
+
+def index_scopes(request):
+    return [caching.scope_all()]
+
 
+def group_scopes(request, slug):
+    return [caching.scope_group(slug), caching.scope_users()]
 
-@cache_page(20, key_prefix='index_page')
+
+def profile_scopes(request, username):
+    return [caching.scope_author(username)]
+
+
+@caching.cache_page_versioned(key_prefix='index_page', scopes=index_scopes)
 def index(request):
     """Отображает все посты, включая те, у которых есть группа."""
-    posts = Post.objects.select_related('author', 'group')
-    page_obj = paginate_page(request, posts)
+    posts = Post.objects.for_cards()
+    page_obj = paginate_page(request, posts, counts.scope_all())
     return render(
         request,
         'posts/index.html',
@@ -18,10 +70,50 @@ def index(request):
     )
 
 
+@caching.cache_page_versioned(key_prefix='index_cards', scopes=index_scopes)
+def index_cards(request):
+    """Следующая порция карточек index."""
+    return render_cards(
+        request,
+        CursorPaginator(
+            Post.objects.for_cards(), settings.POSTS_AMOUNT_PER_PAGE
+        ),
+        bool_flag=True
+    )
+
+
+def post_search(request):
+    """Отображает посты, найденные по запросу ?q=, по релевантности."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = search.SearchPaginator(
+            Post.objects.for_cards(),
+            settings.POSTS_AMOUNT_PER_PAGE,
+            query
+        ).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+    return render(
+        request,
+        'posts/search.html',
+        {
+            'query': query,
+            'page_obj': page_obj,
+        }
+    )
+
+
+@caching.cache_page_versioned(key_prefix='group_page', scopes=group_scopes)
 def group_posts(request, slug):
     """Отображает все посты из группы, определенной по slug."""
     group = get_object_or_404(Group, slug=slug)
-    page_obj = paginate_page(request, group.posts.all())
+    page_obj = paginate_page(
+        request,
+        group.posts.for_cards(),
+        count=group.posts_count
+    )
     return render(
         request,
         'posts/group_list.html',
@@ -32,17 +124,36 @@ def group_posts(request, slug):
     )
 
 
+@caching.cache_page_versioned(key_prefix='group_cards', scopes=group_scopes)
+def group_cards(request, slug):
+    """Следующая порция карточек группы."""
+    group = get_object_or_404(Group, slug=slug)
+    return render_cards(
+        request,
+        CursorPaginator(
+            group.posts.for_cards(), settings.POSTS_AMOUNT_PER_PAGE
+        ),
+        bool_flag=True,
+        group=group
+    )
+
+
+@caching.cache_page_versioned(
+    key_prefix='profile_page',
+    scopes=profile_scopes
+)
 def profile(request, username):
     """Отображает посты пользователя, определенного по username."""
-    author = get_object_or_404(User, username=username)
-    page_obj = paginate_page(request, author.posts.all())
-    following = (
-        request.user.is_authenticated
-        and
-        author.following.filter(
-            user=request.user,
-            author=author
-        ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('counters'),
+        username=username
+    )
+    # Без строки счетчиков (старые пользователи) посты считаются COUNT
+    counters = getattr(author, 'counters', None)
+    page_obj = paginate_page(
+        request,
+        author.posts.for_cards(),
+        count=counters.posts_count if counters else None
     )
     return render(
         request,
@@ -50,24 +161,86 @@ def profile(request, username):
         {
             'author': author,
             'page_obj': page_obj,
-            'following': following
         }
     )
 
 
+@caching.cache_page_versioned(
+    key_prefix='profile_cards',
+    scopes=profile_scopes
+)
+def profile_cards(request, username):
+    """Следующая порция карточек профиля."""
+    author = get_object_or_404(User, username=username)
+    return render_cards(
+        request,
+        CursorPaginator(
+            author.posts.for_cards(), settings.POSTS_AMOUNT_PER_PAGE
+        ),
+        bool_flag=True
+    )
+
+
+def post_detail_scopes(request, post_id):
+    """Области post_detail; без автора в кэше их не узнать."""
+    author_id = caching.post_author_id(post_id)
+    if author_id is None:
+        return None
+    return [
+        caching.scope_post(post_id),
+        caching.scope_author_posts(author_id),
+        caching.scope_users(),
+        caching.scope_groups(),
+    ]
+
+
+@caching.cache_page_versioned(
+    key_prefix='post_page',
+    scopes=post_detail_scopes
+)
 def post_detail(request, post_id):
     """
     Отображает единичный пост, выбранный по post_id.
     Показывает список комментариев, если они есть.
     """
-    post = get_object_or_404(Post, pk=post_id)
-    form = CommentForm(request.POST or None)
+    post = get_object_or_404(
+        Post.objects.for_detail(),
+        pk=post_id
+    )
+    if caching.post_author_id(post.pk) is None:
+        caching.remember_post_author(post)
     return render(
         request,
         'posts/post_detail.html',
         {
             'post': post,
-            'form': form,
+            'comments': comment_chunk(post.comments.all()),
+        }
+    )
+
+
+@caching.cache_page_versioned(
+    key_prefix='comments_chunk',
+    scopes=lambda request, post_id: [
+        caching.scope_post(post_id),
+        caching.scope_users(),
+    ]
+)
+def post_comments(request, post_id):
+    """
+    Следующая порция комментариев поста после ?after= — фрагмент
+    разметки, который post_detail подгружает при прокрутке.
+    """
+    comments = comment_chunk(
+        Comment.objects.filter(post_id=post_id),
+        after=request.GET.get('after')
+    )
+    return render(
+        request,
+        'includes/comments_chunk.html',
+        {
+            'post_id': post_id,
+            'comments': comments,
         }
     )
 
@@ -100,7 +273,10 @@ def post_create(request):
         )
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    store_uploads(post)
+    retry_save(post)
+    if post.image:
+        thumbnails.schedule(post.image.name)
     return redirect('posts:profile', post.author)
 
 
@@ -135,7 +311,11 @@ def post_edit(request, post_id):
             'posts/create_post.html',
             context
         )
-    form.save()
+    post = form.save(commit=False)
+    store_uploads(post)
+    retry_save(post)
+    if 'image' in form.changed_data and post.image:
+        thumbnails.schedule(post.image.name)
     return redirect('posts:post_detail', post_id)
 
 
@@ -150,7 +330,7 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        retry_save(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -160,27 +340,47 @@ def follow_index(request):
     Отображает ленту с постами авторов,
     на которых зафоловлен request.user.
     """
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request, posts)
+    authors = feeds.followed_authors(request.user)
+    page_obj = paginate_page(
+        request,
+        feeds.feed_posts(request.user, authors),
+        lambda: counts.scope_feed(request.user.pk, authors),
+        cursor_paginator_class=partial(
+            feeds.FeedPaginator,
+            user=request.user,
+            authors=authors
+        )
+    )
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
+@login_required
+def follow_cards(request):
+    """Следующая порция карточек ленты подписок."""
+    authors = feeds.followed_authors(request.user)
+    return render_cards(
+        request,
+        feeds.FeedPaginator(
+            feeds.feed_posts(request.user, authors),
+            settings.POSTS_AMOUNT_PER_PAGE,
+            user=request.user,
+            authors=authors
+        ),
+        bool_flag=True
+    )
+
+
 @login_required
 def profile_follow(request, username):
     """
     Обрабатывает подписку.
     Не дает подписаться на самого себя.
-    Создает запись блогер <=> фолловер в БД.
+    Создает запись блогер <=> фолловер в БД, если ее еще нет.
     Декотратор отправляет неавторизованного пользователя залогиниться.
     """
     author = get_object_or_404(User, username=username)
-    is_follow = author.following.filter(
-        user=request.user,
-        author=author
-    ).exists()
-    if author == request.user or is_follow:
-        return redirect('posts:profile', username)
-    author.following.create(user=request.user, author=author)
+    if author != request.user:
+        retry_on_lock(author.following.get_or_create)(user=request.user)
     return redirect('posts:profile', username)
 
 
@@ -198,8 +398,8 @@ def profile_unfollow(request, username):
     ).exists()
     if not is_follow:
         return redirect('posts:profile', username)
-    author.following.filter(
+    retry_on_lock(author.following.filter(
         user=request.user,
         author=author
-    ).delete()
+    ).delete)()
     return redirect('posts:profile', username)
@@ -0,0 +1,160 @@
+"""
+Прогрев кэша страниц после деплоя или перезапуска.
+Горячие страницы (первые страницы index, самые активные группы
+и профили самых читаемых авторов) запрашиваются через WSGI-приложение
+анонимно: записи кэша страниц общие для всех пользователей, поэтому
+одного запроса на адрес достаточно. Запросы идут в несколько потоков,
+пока не кончится бюджет времени; оставшиеся адреса пропускаются.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.urls import reverse
+
+from .caching import CACHE_HEADER
+from .models import Group, Post
+from .utils import PAGINATION_MODE_CURSOR, CursorPaginator
+
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+LOCK_KEY = 'cache_warmup:lock'
+
+
+def index_paths(pages):
+    """Адреса первых страниц index в текущем режиме паджинации."""
+    url = reverse('posts:index')
+    if settings.POSTS_PAGINATION_MODE != PAGINATION_MODE_CURSOR:
+        return [url] + [
+            f'{url}?page={page}' for page in range(2, pages + 1)
+        ]
+    # Курсоры следующих страниц — по ключам постов, без рендера
+    paginator = CursorPaginator(
+        Post.objects.only('created'), settings.POSTS_AMOUNT_PER_PAGE
+    )
+    paths, cursor = [url], None
+    for _ in range(pages - 1):
+        cursor = paginator.get_page(after=cursor).next_cursor
+        if cursor is None:
+            break
+        paths.append(f'{url}?after={cursor}')
+    return paths
+
+
+def hot_paths(index_pages, groups, authors):
+    """Адреса для прогрева в порядке важности."""
+    slugs = Group.objects.order_by('-posts_count').values_list(
+        'slug', flat=True
+    )[:groups]
+    usernames = User.objects.order_by(
+        '-counters__followers_count'
+    ).values_list('username', flat=True)[:authors]
+    return [
+        *index_paths(index_pages),
+        *(reverse('posts:group_list', args=(slug,)) for slug in slugs),
+        *(
+            reverse('posts:profile', args=(username,))
+            for username in usernames
+        ),
+    ]
+
+
+def fetch(application, path):
+    """GET path через WSGI-приложение: статус и результат кэша."""
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': settings.ALLOWED_HOSTS[0],
+        'wsgi.input': BytesIO(),
+    }
+    setup_testing_defaults(environ)
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result['status'] = int(status.split()[0])
+        result['cache'] = dict(headers).get(CACHE_HEADER)
+
+    for _ in application(environ, start_response):
+        pass
+    return result['status'], result['cache']
+
+
+def warm(application, paths, workers, budget):
+    """
+    Запрашивает paths в workers потоков, пока не пройдет budget
+    секунд. Возвращает {адрес: (статус, результат кэша)}; адресов,
+    не успевших за бюджет, в ответе нет.
+    """
+    deadline = time.monotonic() + budget
+    results = {}
+
+    def task(path):
+        if time.monotonic() >= deadline:
+            return
+        try:
+            results[path] = fetch(application, path)
+        finally:
+            connections.close_all()
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(task, path) for path in paths]
+    wait(futures, timeout=max(deadline - time.monotonic(), 0))
+    executor.shutdown(wait=False, cancel_futures=True)
+    for future in futures:
+        if (
+            future.done()
+            and not future.cancelled()
+            and future.exception()
+        ):
+            logger.error(
+                'Ошибка прогрева кэша', exc_info=future.exception()
+            )
+    # Запросы, начатые до конца бюджета, дописывали бы results
+    return dict(results)
+
+
+def warm_hot_pages(application):
+    """Прогревает горячие страницы с параметрами CACHE_WARMUP_*."""
+    paths = hot_paths(
+        settings.CACHE_WARMUP_INDEX_PAGES,
+        settings.CACHE_WARMUP_GROUPS,
+        settings.CACHE_WARMUP_AUTHORS,
+    )
+    return paths, warm(
+        application,
+        paths,
+        settings.CACHE_WARMUP_WORKERS,
+        settings.CACHE_WARMUP_BUDGET
+    )
+
+
+def start_on_startup(application):
+    """
+    Прогрев в фоновом потоке при старте процесса. Кэш общий
+    для воркеров, поэтому прогревает только первый из них.
+    """
+    if not cache.add(LOCK_KEY, 1, settings.CACHE_WARMUP_BUDGET):
+        return
+
+    def run():
+        try:
+            paths, results = warm_hot_pages(application)
+        finally:
+            connections.close_all()
+        logger.info(
+            'Прогрев кэша: %s из %s страниц', len(results), len(paths)
+        )
+
+    threading.Thread(target=run, name='cache-warmup', daemon=True).start()
@@ -0,0 +1,89 @@
+// Подгрузка следующих порций ленты и комментариев. Ссылка
+// с data-autoload загружает порцию по этому адресу, когда появляется
+// на экране или по нажатию на нее; без JS она открывает страницу.
+// С data-autoload-into порция дописывается в элемент с этим id
+// через data-autoload-separator, а адрес следующей порции берется
+// из заголовка Link. Иначе ссылка заменяется полученным фрагментом,
+// в котором может быть ссылка на следующую порцию.
+(function () {
+  var NEXT_RE = /<([^>]*)>;\s*rel="next"/;
+
+  var observer = 'IntersectionObserver' in window && new IntersectionObserver(
+    function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          load(entry.target);
+        }
+      });
+    },
+    {rootMargin: '400px'}
+  );
+
+  function load(link) {
+    if (link.dataset.loading) {
+      return;
+    }
+    link.dataset.loading = 'true';
+    fetch(link.dataset.autoload, {
+      credentials: 'same-origin'
+    }).then(function (response) {
+      var next = NEXT_RE.exec(response.headers.get('Link') || '');
+      return response.text().then(function (html) {
+        return {html: html, next: next && next[1]};
+      });
+    }).then(function (chunk) {
+      delete link.dataset.loading;
+      var into = document.getElementById(link.dataset.autoloadInto || '');
+      if (!into) {
+        link.insertAdjacentHTML('afterend', chunk.html);
+        remove(link);
+        watch();
+        return;
+      }
+      into.insertAdjacentHTML(
+        'beforeend', (link.dataset.autoloadSeparator || '') + chunk.html
+      );
+      if (!chunk.next) {
+        remove(link.closest('li') || link);
+        return;
+      }
+      link.dataset.autoload = chunk.next;
+      link.href = '?' + chunk.next.split('?')[1];
+      if (observer) {
+        // Повторная подписка проверяет, видна ли ссылка и сейчас
+        observer.unobserve(link);
+        observer.observe(link);
+      }
+    }).catch(function () {
+      delete link.dataset.loading;
+    });
+  }
+
+  function remove(element) {
+    if (observer) {
+      element.querySelectorAll('[data-autoload]').forEach(function (link) {
+        observer.unobserve(link);
+      });
+      observer.unobserve(element);
+    }
+    element.remove();
+  }
+
+  function watch() {
+    document.querySelectorAll('a[data-autoload]').forEach(function (link) {
+      if (link.dataset.autoloadWatched) {
+        return;
+      }
+      link.dataset.autoloadWatched = 'true';
+      link.addEventListener('click', function (event) {
+        event.preventDefault();
+        load(link);
+      });
+      if (observer) {
+        observer.observe(link);
+      }
+    });
+  }
+
+  watch();
+})();
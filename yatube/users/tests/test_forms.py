@@ -1,5 +1,5 @@
 from django.urls import reverse
-from django.test import TestCase
+from core.tests.utils import TestCase
 from django.contrib.auth import get_user_model
 
 
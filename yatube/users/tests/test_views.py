@@ -1,5 +1,6 @@
 from django.urls import reverse
-from django.test import TestCase, Client
+from django.test import Client
+from core.tests.utils import TestCase
 from django.contrib.auth import get_user_model
 
 
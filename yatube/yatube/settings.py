@@ -33,6 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы в общее время вошли остальные middleware
+    'core.middleware.timing.TimingMiddleware',
+    'core.middleware.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +43,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Последним: подставляет персональные фрагменты в страницы из кэша
+    'core.middleware.fragments.DeferredFragmentMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -50,7 +55,8 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера для Server-Timing
+        'BACKEND': 'core.template_backends.timed.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -69,11 +75,96 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # SQLite с настройками SQLITE_PRAGMAS и BEGIN IMMEDIATE
+        'ENGINE': 'core.db_backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Настройки каждого соединения с SQLite: журнал WAL позволяет
+# читать во время записи, остальное снижает число синхронизаций с диском
+# и обращений к нему; busy_timeout — сколько мс ждать чужую запись
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+} if strtobool(os.getenv('SQLITE_TUNING', 'True')) else {}
+
+# Повтор записывающих view при временной блокировке базы
+DB_LOCK_RETRIES = 5
+
+DB_LOCK_RETRY_DELAY = 0.05
+
+# Реплики только для чтения (core.routers): пути к копиям базы
+# через запятую в DATABASE_REPLICAS; сама репликация — снаружи
+REPLICA_PATHS = list(
+    filter(None, os.getenv('DATABASE_REPLICAS', '').split(','))
+)
+
+for number, path in enumerate(REPLICA_PATHS, 1):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+READ_REPLICAS = [
+    f'replica{number}' for number in range(1, len(REPLICA_PATHS) + 1)
+]
+
+# Шардирование постов и комментариев по автору (posts.sharding):
+# пути к файлам SQLite шардов через запятую в POST_SHARD_PATHS.
+# Пользователи, группы и подписки остаются в основной базе, поэтому
+# внешние ключи в шардах выключены
+SHARD_PATHS = list(
+    filter(None, os.getenv('POST_SHARD_PATHS', '').split(','))
+)
+
+SHARD_DATABASES = [
+    f'shard{number}' for number in range(1, len(SHARD_PATHS) + 1)
+]
+
+for alias, path in zip(SHARD_DATABASES, SHARD_PATHS):
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'PRAGMAS': {'foreign_keys': 'OFF'},
+    }
+
+# Шарды в работе: первые POST_SHARD_COUNT; из остальных
+# команда reshard переносит посты в рабочие шарды
+POST_SHARDS = SHARD_DATABASES[:int(
+    os.getenv('POST_SHARD_COUNT', len(SHARD_DATABASES))
+)]
+
+DATABASE_ROUTERS = [
+    'posts.sharding.ShardRouter',
+    'core.routers.ReplicaRouter',
+]
+
+# View, которые читают с реплик
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+)
+
+# После записи пользователь столько секунд читает из основной базы,
+# чтобы видеть свои изменения, пока реплики отстают; 0 — не закреплять
+REPLICA_LAG = int(os.getenv('REPLICA_LAG', 5))
+
+REPLICA_PIN_COOKIE = 'primary_pin'
+
+# Приложения, модели которых читаются с реплик; только их запись
+# закрепляет пользователя за основной базой, а сессии и пользователи
+# (с временем входа) всегда в ней
+REPLICA_APPS = ('posts',)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -89,12 +180,100 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Общий для всех процессов кэш в файле SQLite: инвалидация,
+# блокировки и счетчики видны всем воркерам
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache_backends.sqlite.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 512 * 1024 * 1024,
+        },
     }
 }
 
+# Страницы лент сбрасываются сигналами, поэтому кэшируются надолго:
+# после SOFT_TIMEOUT страница пересобирается, а пока идет пересборка,
+# другие запросы получают устаревшую копию; после HARD_TIMEOUT копия удаляется
+PAGE_CACHE_SOFT_TIMEOUT = 60 * 60
+
+PAGE_CACHE_HARD_TIMEOUT = 60 * 60 * 6
+
+# Сколько секунд держится блокировка пересборки страницы
+PAGE_CACHE_LOCK_TIMEOUT = 10
+
+# Страницу, которой нет в кэше, собирает один запрос, остальные
+# опрашивают кэш раз в WAIT_INTERVAL секунд, но не дольше WAIT_TIMEOUT
+PAGE_CACHE_WAIT_TIMEOUT = 2
+
+PAGE_CACHE_WAIT_INTERVAL = 0.05
+
+# Счетчики hit/miss/stale копятся в процессе и пишутся в кэш
+# не чаще раза в столько секунд
+PAGE_CACHE_STATS_FLUSH_INTERVAL = 10
+
+# Прогрев горячих страниц (warm_cache и при старте WSGI-процесса):
+# первые страницы index, самые активные группы и самые читаемые авторы
+CACHE_WARMUP_ON_STARTUP = strtobool(
+    os.getenv('CACHE_WARMUP_ON_STARTUP', 'False')
+)
+
+CACHE_WARMUP_INDEX_PAGES = 5
+
+CACHE_WARMUP_GROUPS = 10
+
+CACHE_WARMUP_AUTHORS = 20
+
+CACHE_WARMUP_WORKERS = 4
+
+# Бюджет прогрева в секундах: не успевшие страницы пропускаются
+CACHE_WARMUP_BUDGET = 30
+
+# Карточки постов меняют ключ при изменении поста, поэтому хранятся сутки
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Замеры запросов (TimingMiddleware) пишутся в лог по строке JSON
+# на запрос; при запуске тестов — только при явно заданном уровне
+# (core.tests.runner)
+REQUEST_TIMING_LOG_LEVEL = os.getenv('REQUEST_TIMING_LOG_LEVEL', 'INFO')
+
+TEST_RUNNER = 'core.tests.runner.TestRunner'
+
+# Метрики Prometheus (/metrics): процессы копят их в памяти и раз
+# в METRICS_FLUSH_INTERVAL секунд сбрасывают в общий файл SQLite;
+# если задан METRICS_TOKEN, /metrics требует Authorization: Bearer <токен>
+METRICS_ENABLED = strtobool(os.getenv('METRICS_ENABLED', 'True'))
+
+METRICS_LOCATION = os.getenv(
+    'METRICS_LOCATION',
+    os.path.join(BASE_DIR, 'cache', 'metrics.sqlite3')
+)
+
+METRICS_FLUSH_INTERVAL = 1
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware.timing': {
+            'handlers': ['console'],
+            'level': REQUEST_TIMING_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 LANGUAGE_CODE = 'ru'
 
 TIME_ZONE = 'UTC'
@@ -121,6 +300,33 @@ DEFAULT_POSTS_AMOUNT_PER_PAGE = 10
 
 POSTS_AMOUNT_PER_PAGE = int(os.getenv('POSTS_AMOUNT_PER_PAGE', DEFAULT_POSTS_AMOUNT_PER_PAGE))
 
+# 'pages' — нумерованные страницы, 'cursor' — паджинация по ключу (created, id)
+POSTS_PAGINATION_MODE = os.getenv('POSTS_PAGINATION_MODE', 'pages')
+
+# Комментарии на post_detail и в каждой следующей порции
+COMMENTS_PER_CHUNK = 50
+
+# Сколько хранится в кэше количество постов для нумерованных страниц
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+
+# Выше этого порога количество постов считается приблизительно
+POSTS_COUNT_APPROXIMATE_THRESHOLD = 100_000
+
+# Сколько записей хранится в материализованной ленте подписок пользователя
+FEED_MAX_ENTRIES = 1000
+
+# Посты авторов с большим числом подписчиков подмешиваются в ленту при чтении
+FEED_FANOUT_MAX_FOLLOWERS = 10_000
+
+# Автор, переставший быть популярным, подмешивается при чтении, пока
+# подписчиков не станет не больше этого порога; затем ленты подписчиков
+# дополняет rebuild_feeds --backfill. Зазор между порогами не дает
+# автору у границы заново раскладываться после каждой отписки
+FEED_BACKFILL_MAX_FOLLOWERS = 8_000
+
+# Сколько лент подписчиков дополняется в одной транзакции
+FEED_BACKFILL_BATCH_SIZE = 100
+
 TRIM_STRING_LENGTH = 100
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
@@ -128,3 +334,21 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Варианты картинок постов для srcset: рамка, в которую вписывается
+# картинка на широком экране, дополнительные ширины и форматы
+# (последний формат — запасной для тега <img>)
+POST_IMAGE_BOX = (960, 339)
+
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+
+# Процессы для создания миниатюр; 0 — создавать в процессе запроса
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+
+# Сколько секунд картинка без вариантов, отданная пулу при показе,
+# не отдается повторно
+THUMBNAIL_PENDING_TIMEOUT = 60 * 5